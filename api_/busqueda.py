@@ -0,0 +1,162 @@
+import re
+import html
+import json
+import base64
+import unicodedata
+
+from bson import ObjectId
+
+# ======================================================
+# BÚSQUEDA DE TEXTO COMPLETO EN TIPS
+# ======================================================
+# Índice de texto de Mongo sobre tips.comment con stemming en español.
+# Un documento de la colección `tips` es un usuario con su array de tips:
+# el índice encuentra y ordena usuarios por relevancia, y aquí solo se
+# recorren los tips de los documentos de la página para sacar fragmentos.
+
+INDICE_TEXTO = "tips_comment_texto"
+CAMPOS_USUARIO = ["user_id", "user_name", "user_location", "user_url", "municipio", "departamento"]
+VENTANA_FRAGMENTO = 70  # caracteres a cada lado de la primera coincidencia
+
+
+async def crear_indice_texto(db):
+    await db.tips.create_index(
+        [("tips.comment", "text")],
+        name=INDICE_TEXTO,
+        default_language="spanish",
+        # Campo inexistente: evita que un "language" del documento cambie el idioma
+        language_override="_idioma_texto",
+    )
+
+
+# ---------- cursor de paginación (keyset) ----------
+def codificar_cursor(score: float, _id) -> str:
+    crudo = json.dumps({"s": score, "id": str(_id)}).encode()
+    return base64.urlsafe_b64encode(crudo).decode()
+
+
+def decodificar_cursor(cursor: str):
+    datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not ObjectId.is_valid(datos["id"]):
+        raise ValueError("id no válido")
+    return float(datos["s"]), ObjectId(datos["id"])
+
+
+# ---------- resaltado ----------
+def _normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes, conservando la longitud del texto."""
+    return "".join(unicodedata.normalize("NFD", c.lower())[0] for c in texto)
+
+
+def patron_terminos(consulta: str):
+    """
+    Regex aproximado de los términos de la consulta: sin tildes, sin los
+    términos negados (-palabra) y tolerante a plurales (playa/playas).
+    """
+    terminos = []
+    for t in re.findall(r'-?\w+', _normalizar(consulta)):
+        if t.startswith("-") or len(t) < 2:
+            continue
+        raiz = re.sub(r"(es|s)$", "", t) if len(t) > 4 else t
+        terminos.append(re.escape(raiz))
+    if not terminos:
+        return None
+    return re.compile(r"\b(?:%s)\w*" % "|".join(terminos))
+
+
+def fragmento(comentario: str, patron) -> str:
+    """
+    Trozo del comentario alrededor de las coincidencias, marcadas con <mark>.
+    El resto del texto va escapado para poder mostrarlo como HTML.
+    """
+    normalizado = _normalizar(comentario)
+    coincidencias = list(patron.finditer(normalizado))
+    if not coincidencias:
+        return None
+
+    inicio = max(0, coincidencias[0].start() - VENTANA_FRAGMENTO)
+    fin = min(len(comentario), coincidencias[0].end() + VENTANA_FRAGMENTO)
+
+    partes, pos = [], inicio
+    for m in coincidencias:
+        if m.start() < inicio or m.end() > fin:
+            continue
+        partes.append(html.escape(comentario[pos:m.start()]))
+        partes.append(f"<mark>{html.escape(comentario[m.start():m.end()])}</mark>")
+        pos = m.end()
+    partes.append(html.escape(comentario[pos:fin]))
+
+    return ("…" if inicio > 0 else "") + "".join(partes) + ("…" if fin < len(comentario) else "")
+
+
+# ---------- consulta ----------
+def pipeline_busqueda(consulta: str, departamento: str = None, municipio: str = None,
+                      cursor: str = None, limite: int = 20) -> list:
+    filtro = {"$text": {"$search": consulta, "$language": "spanish"}}
+    if departamento:
+        filtro["departamento"] = {"$regex": departamento, "$options": "i"}
+    if municipio:
+        filtro["municipio"] = {"$regex": municipio, "$options": "i"}
+
+    pipeline = [
+        {"$match": filtro},
+        {"$addFields": {"_score": {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        score, ultimo_id = decodificar_cursor(cursor)
+        pipeline.append({"$match": {"$or": [
+            {"_score": {"$lt": score}},
+            {"_score": score, "_id": {"$gt": ultimo_id}},
+        ]}})
+
+    pipeline += [
+        {"$sort": {"_score": -1, "_id": 1}},
+        {"$limit": limite + 1},  # uno de más para saber si hay otra página
+        {"$project": {
+            **{c: 1 for c in CAMPOS_USUARIO},
+            "_score": 1,
+            "tips.comment": 1,
+            "tips.date": 1,
+        }},
+    ]
+    return pipeline
+
+
+async def buscar_tips(db, consulta: str, departamento: str = None, municipio: str = None,
+                      cursor: str = None, limite: int = 20, tips_por_usuario: int = 3) -> dict:
+    cursor_mongo = db.tips.aggregate(
+        pipeline_busqueda(consulta, departamento, municipio, cursor, limite)
+    )
+    documentos = await cursor_mongo.to_list(length=limite + 1)
+
+    hay_mas = len(documentos) > limite
+    documentos = documentos[:limite]
+    patron = patron_terminos(consulta)
+
+    resultados = []
+    for doc in documentos:
+        coincidencias = []
+        for tip in doc.get("tips") or []:
+            comentario = tip.get("comment") or ""
+            trozo = fragmento(comentario, patron) if patron else None
+            if trozo:
+                coincidencias.append({"date": tip.get("date"), "fragmento": trozo})
+                if len(coincidencias) >= tips_por_usuario:
+                    break
+
+        resultados.append({
+            **{c: doc.get(c) for c in CAMPOS_USUARIO},
+            "score": round(doc["_score"], 4),
+            "coincidencias": coincidencias,
+        })
+
+    siguiente = None
+    if hay_mas and documentos:
+        siguiente = codificar_cursor(documentos[-1]["_score"], documentos[-1]["_id"])
+
+    return {
+        "consulta": consulta,
+        "total": len(resultados),
+        "resultados": resultados,
+        "siguiente": siguiente,
+    }
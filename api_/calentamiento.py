@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+
+# ======================================================
+# CACHÉ DE RESPUESTAS + CALENTAMIENTO EN SEGUNDO PLANO
+# ======================================================
+# Las respuestas de los endpoints que usa el dashboard se guardan ya
+# serializadas (bytes JSON) por (endpoint, departamento). Al arrancar la API,
+# y después de cada refresco de datos, se precalculan para los 8 departamentos
+# del Caribe con paralelismo acotado, así el primer clic sale del caché.
+# Solo se cachean esos departamentos: cualquier otro texto (el parámetro es un
+# regex libre) se consulta directo, para que nadie pueda inflar la memoria.
+#
+#   API_CACHE_TTL_S        vida de una respuesta cacheada (def. 3600)
+#   API_CACHE_MAX_ENTRADAS respuestas guardadas como máximo, expulsión LRU (def. 64)
+#   WARMUP_PARALELISMO     departamentos calentándose a la vez (def. 2)
+#   WARMUP_INTERVALO_S     cada cuánto se recalienta todo; 0 = solo al arrancar (def. 3000)
+
+log = logging.getLogger(__name__)
+
+# Mismos valores que la barra lateral del dashboard (el regex usa el texto tal cual)
+DEPARTAMENTOS_CARIBE = [
+    "Atlántico", "Bolívar", "Córdoba", "Sucre",
+    "Magdalena", "La Guajira", "Cesar", "San Andrés "
+]
+
+
+class CacheRespuestas:
+
+    def __init__(self, ttl_s: float, max_entradas: int = 64):
+        self.ttl_s = ttl_s
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # (endpoint, departamento) -> (bytes, creado), LRU
+        self._pendientes = {}  # evita calcular dos veces la misma clave a la vez
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    def _vigente(self, clave):
+        entrada = self._entradas.get(clave)
+        if entrada and time.monotonic() - entrada[1] < self.ttl_s:
+            self._entradas.move_to_end(clave)
+            return entrada[0]
+        return None
+
+    def _guardar(self, clave, contenido: bytes):
+        ahora = time.monotonic()
+        # Fuera las vencidas y, si aún sobra, las usadas hace más tiempo
+        for vieja in [c for c, (_, creado) in self._entradas.items() if ahora - creado >= self.ttl_s]:
+            del self._entradas[vieja]
+        self._entradas[clave] = (contenido, ahora)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    @staticmethod
+    def _serializar(payload) -> bytes:
+        return json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    async def calcular(self, endpoint: str, departamento: str, consulta) -> bytes:
+        """Ejecuta la consulta y guarda el JSON serializado. Las excepciones no se cachean."""
+        clave = (endpoint, departamento)
+        pendiente = self._pendientes.get(clave)
+        if pendiente:
+            return await asyncio.shield(pendiente)
+
+        async def _calcular():
+            contenido = self._serializar(await consulta(departamento))
+            self._guardar(clave, contenido)
+            return contenido
+
+        tarea = asyncio.ensure_future(_calcular())
+        self._pendientes[clave] = tarea
+        try:
+            return await tarea
+        finally:
+            self._pendientes.pop(clave, None)
+
+    async def responder(self, endpoint: str, departamento: str, consulta) -> Response:
+        if departamento not in DEPARTAMENTOS_CARIBE:
+            contenido = self._serializar(await consulta(departamento))
+            return Response(content=contenido, media_type="application/json")
+
+        contenido = self._vigente((endpoint, departamento))
+        if contenido is None:
+            contenido = await self.calcular(endpoint, departamento, consulta)
+        return Response(content=contenido, media_type="application/json")
+
+
+class Calentador:
+    """Precalcula las respuestas de `consultas` {endpoint: funcion(departamento)}."""
+
+    def __init__(self, cache: CacheRespuestas, consultas: dict, paralelismo: int):
+        self.cache = cache
+        self.consultas = consultas
+        self.paralelismo = paralelismo
+        self._cambio = asyncio.Event()
+        self.estado = {
+            "estado": "pendiente",
+            "iniciado": None,
+            "terminado": None,
+            "departamentos": {},
+        }
+
+    @property
+    def listo(self) -> bool:
+        return self.estado["estado"] == "listo"
+
+    async def _calentar_departamento(self, departamento, semaforo):
+        async with semaforo:
+            inicio = time.perf_counter()
+            info = {"listo": False, "segundos": None, "errores": {}}
+            self.estado["departamentos"][departamento] = info
+
+            for endpoint, consulta in self.consultas.items():
+                try:
+                    await self.cache.calcular(endpoint, departamento, consulta)
+                except HTTPException as e:
+                    if e.status_code != 404:  # 404 = sin datos, no es un error
+                        info["errores"][endpoint] = str(e.detail)
+                except Exception as e:
+                    info["errores"][endpoint] = str(e)
+
+            info["listo"] = not info["errores"]
+            info["segundos"] = round(time.perf_counter() - inicio, 3)
+
+    async def calentar(self):
+        """Calienta todos los departamentos una vez."""
+        self.estado.update(estado="calentando", iniciado=time.time(), terminado=None)
+        self.estado["departamentos"] = {}
+        semaforo = asyncio.Semaphore(self.paralelismo)
+
+        await asyncio.gather(*(
+            self._calentar_departamento(dep, semaforo) for dep in DEPARTAMENTOS_CARIBE
+        ))
+
+        errores = any(not d["listo"] for d in self.estado["departamentos"].values())
+        self.estado.update(estado="con_errores" if errores else "listo", terminado=time.time())
+        log.info("Calentamiento terminado: %s", self.estado["estado"])
+
+    def refrescar(self):
+        """Señal de que los datos cambiaron: invalida el caché y recalienta."""
+        self.cache.limpiar()
+        self._cambio.set()
+
+    async def ciclo(self, intervalo_s: float):
+        """Tarea de fondo: calienta al arrancar, tras cada refresco y cada `intervalo_s`."""
+        while True:
+            self._cambio.clear()
+            try:
+                await self.calentar()
+            except Exception as e:
+                log.error("Error en el calentamiento: %s", e)
+                self.estado.update(estado="con_errores", terminado=time.time())
+
+            try:
+                await asyncio.wait_for(self._cambio.wait(), timeout=intervalo_s or None)
+            except asyncio.TimeoutError:
+                pass
+
+
+def crear_calentador(consultas: dict) -> Calentador:
+    cache = CacheRespuestas(
+        ttl_s=float(os.getenv("API_CACHE_TTL_S", "3600")),
+        max_entradas=int(os.getenv("API_CACHE_MAX_ENTRADAS", "64")),
+    )
+    return Calentador(
+        cache,
+        consultas,
+        paralelismo=int(os.getenv("WARMUP_PARALELISMO", "2")),
+    )
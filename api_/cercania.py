@@ -0,0 +1,116 @@
+import asyncio
+import logging
+
+# ======================================================
+# SITIOS CERCANOS (ÍNDICE 2dsphere)
+# ======================================================
+# sities_clean guarda `latitude` y `longitude` como campos sueltos. Aquí se
+# agrega `ubicacion` (GeoJSON Point, [lon, lat]) con un índice 2dsphere para
+# responder "los k más cercanos" y "todo lo que está a menos de X m" con
+# $geoNear, sin descargar el departamento entero.
+#
+# Los sitios sin coordenadas válidas quedan con `ubicacion: null` (el índice
+# los ignora). El vigilante de sincronizacion.py la recalcula en cada
+# inserción o cambio; para rehacerla en todos: python cercania.py --completo
+
+log = logging.getLogger(__name__)
+
+CAMPO_UBICACION = "ubicacion"
+INDICE_GEO = "sities_ubicacion_2dsphere"
+CAMPOS_PROYECTABLES = ["nombre", "categoria", "departamento", "municipio", "latitude", "longitude"]
+
+
+# ---------- índice y relleno ----------
+async def crear_indice_geo(db):
+    # categoria como sufijo: el filtro por categoría se resuelve en el mismo índice
+    await db.sities_clean.create_index(
+        [(CAMPO_UBICACION, "2dsphere"), ("categoria", 1)],
+        name=INDICE_GEO,
+    )
+
+
+def _a_numero(campo: str) -> dict:
+    return {"$convert": {"input": f"${campo}", "to": "double", "onError": None, "onNull": None}}
+
+
+def expresion_ubicacion() -> dict:
+    """Expresión de agregación: el Point [lon, lat] del documento, o null."""
+    valida = {"$and": [
+        {"$ne": ["$$lat", None]}, {"$ne": ["$$lon", None]},
+        # NaN es menor que cualquier número en Mongo: también queda fuera
+        {"$gte": ["$$lat", -90]}, {"$lte": ["$$lat", 90]},
+        {"$gte": ["$$lon", -180]}, {"$lte": ["$$lon", 180]},
+    ]}
+    return {"$let": {
+        "vars": {"lat": _a_numero("latitude"), "lon": _a_numero("longitude")},
+        "in": {"$cond": [
+            valida,
+            {"type": "Point", "coordinates": ["$$lon", "$$lat"]},
+            None,
+        ]},
+    }}
+
+
+async def rellenar_ubicaciones(db, completo: bool = False) -> int:
+    """
+    Calcula `ubicacion` desde latitude/longitude. Por defecto solo en los
+    sitios que aún no la tienen; con `completo`, en todos.
+    """
+    filtro = {} if completo else {CAMPO_UBICACION: {"$exists": False}}
+    resultado = await db.sities_clean.update_many(
+        filtro, [{"$set": {CAMPO_UBICACION: expresion_ubicacion()}}]
+    )
+    if resultado.modified_count:
+        log.info("sities_clean: %s documentos con %s calculada",
+                 resultado.modified_count, CAMPO_UBICACION)
+    return resultado.modified_count
+
+
+# ---------- consulta ----------
+def pipeline_cercanos(lat: float, lon: float, radio_m: float = None, limite: int = 20,
+                      categorias: list = None, campos: list = None) -> list:
+    """
+    $geoNear desde (lat, lon): los `limite` sitios más cercanos, dentro de
+    `radio_m` metros si se indica. `distancia_m` va en metros.
+    """
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [lon, lat]},
+        "key": CAMPO_UBICACION,
+        "distanceField": "distancia_m",
+        "spherical": True,
+    }
+    if radio_m is not None:
+        geo_near["maxDistance"] = radio_m
+    if categorias:
+        geo_near["query"] = {"categoria": {"$in": categorias}}
+
+    return [
+        {"$geoNear": geo_near},
+        {"$limit": limite},
+        {"$project": {
+            "_id": 0,
+            **{c: 1 for c in (campos or CAMPOS_PROYECTABLES)},
+            "distancia_m": {"$round": ["$distancia_m", 1]},
+        }},
+    ]
+
+
+async def buscar_cercanos(db, lat: float, lon: float, radio_m: float = None, limite: int = 20,
+                          categorias: list = None, campos: list = None) -> list:
+    cursor = db.sities_clean.aggregate(
+        pipeline_cercanos(lat, lon, radio_m, limite, categorias, campos)
+    )
+    return await cursor.to_list(length=limite)
+
+
+if __name__ == "__main__":
+    # python cercania.py [--completo]  -> crea el índice y rellena `ubicacion`
+    import sys
+    from main import db_foursquare
+
+    async def _preparar():
+        await crear_indice_geo(db_foursquare)
+        return await rellenar_ubicaciones(db_foursquare, completo="--completo" in sys.argv)
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"{asyncio.run(_preparar())} sitios actualizados")
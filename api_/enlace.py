@@ -0,0 +1,371 @@
+import re
+import time
+import math
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from difflib import SequenceMatcher
+
+from pymongo import UpdateOne, DeleteOne, InsertOne
+
+import tareas
+
+# ======================================================
+# ENLACE FOURSQUARE <-> GOOGLE MAPS
+# ======================================================
+# Empareja los sitios de foursquare_scraping.sities_clean con los de
+# Googlemaps_Scraping.sities. Solo se comparan sitios del mismo bloque
+# (departamento + municipio normalizados) y, si ambos tienen coordenadas,
+# de geohashes vecinos. Los pares se guardan en `enlaces_sitios` con su score.
+#
+# El recálculo es incremental: `enlaces_estado` guarda una huella por sitio y
+# solo se vuelven a emparejar los bloques donde algún sitio cambió.
+
+log = logging.getLogger(__name__)
+
+COLECCION_ENLACES = "enlaces_sitios"
+COLECCION_ESTADO = "enlaces_estado"
+
+UMBRAL_SCORE = 0.82
+DISTANCIA_MAX_M = 1500      # con coordenadas en ambos, más lejos no es el mismo sitio
+PRECISION_GEOHASH = 5       # celdas de ~4.9 km x 4.9 km
+PALABRAS_VACIAS = {"el", "la", "los", "las", "de", "del", "y", "the", "and", "of"}
+# Tipos de lugar que una fuente pone en el nombre y la otra no
+# ("Restaurante La Cevichería" / "La Cevicheria"): no cuentan al comparar
+PALABRAS_GENERICAS = {
+    "restaurante", "restaurant", "hotel", "hostal", "bar", "cafe", "cafeteria",
+    "panaderia", "heladeria", "tienda", "parque", "playa", "museo", "iglesia",
+    "discoteca", "pizzeria", "asadero", "comidas", "rapidas",
+}
+# Hasta cuánto sube el score un par muy cercano (0 a DISTANCIA_MAX_M o más)
+BONO_CERCANIA = 0.15
+# Cambia la huella de todos los sitios: al subirla, el siguiente enlace
+# incremental recalcula todos los bloques con el score nuevo
+VERSION_SCORE = 2
+
+CAMPOS_SITIO = {"nombre": 1, "departamento": 1, "municipio": 1, "latitude": 1, "longitude": 1}
+
+# Resumen de la última ejecución (lo muestra /enlaces/estado)
+ultimo_resultado = {"estado": "sin_ejecutar"}
+
+
+# ---------- normalización ----------
+def normalizar(texto) -> str:
+    texto = unicodedata.normalize("NFD", str(texto or "").lower())
+    texto = "".join(c for c in texto if unicodedata.category(c) != "Mn")
+    return re.sub(r"[^a-z0-9]+", " ", texto).strip()
+
+
+def tokens(nombre_norm: str) -> set:
+    return {t for t in nombre_norm.split() if t not in PALABRAS_VACIAS}
+
+
+def nombre_comparable(nombre_norm: str) -> str:
+    """El nombre sin artículos ni tipos de lugar (o completo, si no queda nada)."""
+    palabras = [p for p in nombre_norm.split() if p not in PALABRAS_VACIAS | PALABRAS_GENERICAS]
+    return " ".join(palabras) or nombre_norm
+
+
+# ---------- geohash ----------
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lon: float, precision: int = PRECISION_GEOHASH) -> str:
+    lat_rango, lon_rango = [-90.0, 90.0], [-180.0, 180.0]
+    resultado, bits, n_bits, par = [], 0, 0, True
+    while len(resultado) < precision:
+        rango, valor = (lon_rango, lon) if par else (lat_rango, lat)
+        medio = (rango[0] + rango[1]) / 2
+        bits <<= 1
+        if valor >= medio:
+            bits |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        par = not par
+        n_bits += 1
+        if n_bits == 5:
+            resultado.append(_BASE32[bits])
+            bits, n_bits = 0, 0
+    return "".join(resultado)
+
+
+def _tamaño_celda(precision: int):
+    bits = precision * 5
+    bits_lon = (bits + 1) // 2
+    return 180.0 / 2 ** (bits - bits_lon), 360.0 / 2 ** bits_lon
+
+
+def geohashes_vecinos(lat: float, lon: float, precision: int = PRECISION_GEOHASH) -> set:
+    """La celda del punto y sus 8 vecinas."""
+    d_lat, d_lon = _tamaño_celda(precision)
+    return {
+        geohash(max(-90.0, min(90.0, lat + i * d_lat)), ((lon + j * d_lon + 180) % 360) - 180, precision)
+        for i in (-1, 0, 1) for j in (-1, 0, 1)
+    }
+
+
+def distancia_m(a: dict, b: dict) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a["lat"], a["lon"], b["lat"], b["lon"]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6_371_000 * math.asin(math.sqrt(h))
+
+
+# ---------- preparación de sitios ----------
+def _coordenada(valor):
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(valor) else valor
+
+
+def preparar(doc: dict) -> dict:
+    nombre = normalizar(doc.get("nombre"))
+    comparable = nombre_comparable(nombre)
+    sitio = {
+        "_id": doc["_id"],
+        "nombre": comparable,
+        "tokens": tokens(comparable),
+        "departamento": normalizar(doc.get("departamento")),
+        "municipio": normalizar(doc.get("municipio")),
+        "lat": _coordenada(doc.get("latitude")),
+        "lon": _coordenada(doc.get("longitude")),
+    }
+    sitio["bloque"] = f"{sitio['departamento']}|{sitio['municipio']}"
+    sitio["huella"] = hashlib.sha1(
+        f"{VERSION_SCORE}|{nombre}|{sitio['bloque']}|{sitio['lat']}|{sitio['lon']}".encode()
+    ).hexdigest()
+    return sitio
+
+
+def _tiene_coordenadas(sitio):
+    return sitio["lat"] is not None and sitio["lon"] is not None
+
+
+# ---------- score ----------
+def score_nombres(a: dict, b: dict) -> float:
+    if not a["nombre"] or not b["nombre"]:
+        return 0.0
+    ratio = SequenceMatcher(None, a["nombre"], b["nombre"]).ratio()
+    union = a["tokens"] | b["tokens"]
+    jaccard = len(a["tokens"] & b["tokens"]) / len(union) if union else 0.0
+    return 0.6 * ratio + 0.4 * jaccard
+
+
+def score_par(a: dict, b: dict, distancia: float = None) -> float:
+    """Score del nombre más un bono por cercanía si ambos tienen coordenadas."""
+    score = score_nombres(a, b)
+    if distancia is not None:
+        score += BONO_CERCANIA * max(0.0, 1 - distancia / DISTANCIA_MAX_M)
+    return min(1.0, score)
+
+
+def emparejar_bloque(sitios_fs: list, sitios_gm: list) -> list:
+    """Pares (fs, gm, score) uno a uno, de mayor a menor score."""
+    por_celda, sin_coordenadas = {}, []
+    for gm in sitios_gm:
+        if _tiene_coordenadas(gm):
+            por_celda.setdefault(geohash(gm["lat"], gm["lon"]), []).append(gm)
+        else:
+            sin_coordenadas.append(gm)
+
+    candidatos = []
+    for fs in sitios_fs:
+        if _tiene_coordenadas(fs) and por_celda:
+            opciones = [gm for celda in geohashes_vecinos(fs["lat"], fs["lon"])
+                        for gm in por_celda.get(celda, ())]
+            opciones += sin_coordenadas
+        else:
+            opciones = sitios_gm
+
+        for gm in opciones:
+            distancia = None
+            if _tiene_coordenadas(fs) and _tiene_coordenadas(gm):
+                distancia = distancia_m(fs, gm)
+                if distancia > DISTANCIA_MAX_M:
+                    continue
+            score = score_par(fs, gm, distancia)
+            if score >= UMBRAL_SCORE:
+                candidatos.append((score, fs, gm))
+
+    candidatos.sort(key=lambda c: c[0], reverse=True)
+    usados_fs, usados_gm, pares = set(), set(), []
+    for score, fs, gm in candidatos:
+        if fs["_id"] in usados_fs or gm["_id"] in usados_gm:
+            continue
+        usados_fs.add(fs["_id"])
+        usados_gm.add(gm["_id"])
+        pares.append((fs, gm, score))
+    return pares
+
+
+# ---------- índices ----------
+async def crear_indices_enlace(db_fs):
+    enlaces = db_fs[COLECCION_ENLACES]
+    await enlaces.create_index([("departamento_norm", 1), ("municipio_norm", 1)])
+    await enlaces.create_index("bloque")
+    await enlaces.create_index("gm_id")
+
+
+# ---------- trabajo de enlace ----------
+async def enlazar(db_fs, db_gm, completo: bool = False) -> dict:
+    """
+    Recalcula los enlaces de los bloques con sitios nuevos, modificados o
+    borrados (o de todos si `completo`). Devuelve un resumen.
+    """
+    global ultimo_resultado
+    inicio = time.perf_counter()
+    ultimo_resultado = {"estado": "ejecutando", "iniciado": time.time()}
+
+    sitios = {"fs": {}, "gm": {}}
+    async for doc in db_fs.sities_clean.find({}, CAMPOS_SITIO):
+        sitio = preparar(doc)
+        sitios["fs"][f"fs:{sitio['_id']}"] = sitio
+    async for doc in db_gm.sities.find({}, CAMPOS_SITIO):
+        sitio = preparar(doc)
+        sitios["gm"][f"gm:{sitio['_id']}"] = sitio
+
+    estado = {}
+    if not completo:
+        async for doc in db_fs[COLECCION_ESTADO].find({}):
+            estado[doc["_id"]] = doc
+
+    # Bloques afectados: donde está ahora y donde estaba antes cada sitio cambiado
+    bloques, cambios_estado = set(), []
+    actuales = {**sitios["fs"], **sitios["gm"]}
+    for clave, sitio in actuales.items():
+        previo = estado.get(clave)
+        if completo or previo is None or previo["huella"] != sitio["huella"]:
+            bloques.add(sitio["bloque"])
+            if previo:
+                bloques.add(previo["bloque"])
+            cambios_estado.append(UpdateOne(
+                {"_id": clave},
+                {"$set": {"huella": sitio["huella"], "bloque": sitio["bloque"]}},
+                upsert=True,
+            ))
+    for clave, previo in estado.items():
+        if clave not in actuales:
+            bloques.add(previo["bloque"])
+            cambios_estado.append(DeleteOne({"_id": clave}))
+
+    # Emparejar solo los bloques afectados
+    por_bloque = {}
+    for lado in ("fs", "gm"):
+        for sitio in sitios[lado].values():
+            if sitio["bloque"] in bloques:
+                por_bloque.setdefault(sitio["bloque"], {"fs": [], "gm": []})[lado].append(sitio)
+
+    nuevos = []
+    ahora = time.time()
+    for bloque, lados in por_bloque.items():
+        if not lados["fs"] or not lados["gm"]:
+            continue
+        for fs, gm, score in emparejar_bloque(lados["fs"], lados["gm"]):
+            nuevos.append(InsertOne({
+                "_id": fs["_id"],
+                "gm_id": gm["_id"],
+                "score": round(score, 4),
+                "bloque": bloque,
+                "departamento_norm": fs["departamento"],
+                "municipio_norm": fs["municipio"],
+                "actualizado": ahora,
+            }))
+        # Ceder el loop entre bloques grandes
+        await asyncio.sleep(0)
+
+    enlaces = db_fs[COLECCION_ENLACES]
+    if completo:
+        await enlaces.delete_many({})
+    elif bloques:
+        await enlaces.delete_many({"bloque": {"$in": list(bloques)}})
+    if nuevos:
+        await enlaces.bulk_write(nuevos, ordered=False)
+
+    if completo:
+        await db_fs[COLECCION_ESTADO].delete_many({})
+    if cambios_estado:
+        await db_fs[COLECCION_ESTADO].bulk_write(cambios_estado, ordered=False)
+
+    ultimo_resultado = {
+        "estado": "listo",
+        "completo": completo,
+        "sitios_foursquare": len(sitios["fs"]),
+        "sitios_google": len(sitios["gm"]),
+        "sitios_cambiados": len(cambios_estado),
+        "bloques_recalculados": len(bloques),
+        "enlaces_escritos": len(nuevos),
+        "segundos": round(time.perf_counter() - inicio, 2),
+        "terminado": time.time(),
+    }
+    log.info("Enlace de sitios: %s", ultimo_resultado)
+    return ultimo_resultado
+
+
+def lanzar_enlace(db_fs, db_gm, completo: bool = False) -> bool:
+    """Programa `enlazar` en segundo plano. False si ya hay uno en ejecución."""
+    global ultimo_resultado
+    if ultimo_resultado.get("estado") == "ejecutando":
+        return False
+    ultimo_resultado = {"estado": "ejecutando", "iniciado": time.time()}
+
+    async def _ejecutar():
+        global ultimo_resultado
+        try:
+            await enlazar(db_fs, db_gm, completo)
+        except Exception as e:
+            log.error("Error en el enlace de sitios: %s", e)
+            ultimo_resultado = {"estado": "error", "error": str(e), "terminado": time.time()}
+
+    tareas.lanzar(_ejecutar(), "enlace_sitios")
+    return True
+
+
+# ---------- consulta ----------
+async def obtener_enlaces(db_fs, db_gm, departamento: str, municipio: str = None,
+                          score_min: float = UMBRAL_SCORE) -> list:
+    """Pares enlazados con los datos de cada lado (búsqueda por _id en ambas bases)."""
+    filtro = {
+        "departamento_norm": {"$regex": "^" + re.escape(normalizar(departamento))},
+        "score": {"$gte": score_min},
+    }
+    if municipio:
+        filtro["municipio_norm"] = {"$regex": "^" + re.escape(normalizar(municipio))}
+
+    enlaces = await db_fs[COLECCION_ENLACES].find(filtro).to_list(length=None)
+    if not enlaces:
+        return []
+
+    fs_docs = {
+        d["_id"]: d async for d in db_fs.sities_clean.find(
+            {"_id": {"$in": [e["_id"] for e in enlaces]}},
+            {"nombre": 1, "categoria": 1, "municipio": 1, "departamento": 1, "latitude": 1, "longitude": 1},
+        )
+    }
+    gm_docs = {
+        d["_id"]: d async for d in db_gm.sities.find(
+            {"_id": {"$in": [e["gm_id"] for e in enlaces]}},
+            {"nombre": 1, "categoria": 1, "puntuacion": 1, "municipio": 1},
+        )
+    }
+
+    resultado = []
+    for e in enlaces:
+        fs, gm = fs_docs.get(e["_id"]), gm_docs.get(e["gm_id"])
+        if fs is None or gm is None:
+            continue  # borrado después del último enlace
+        fs.pop("_id")
+        gm.pop("_id")
+        resultado.append({"score": e["score"], "foursquare": fs, "google": gm})
+    return resultado
+
+
+if __name__ == "__main__":
+    # python enlace.py [--completo]
+    import sys
+    from main import db_foursquare, db_google
+
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(enlazar(db_foursquare, db_google, completo="--completo" in sys.argv)))
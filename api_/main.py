@@ -1,9 +1,23 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Header
+from fastapi.responses import FileResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from datetime import datetime
 import certifi
+import asyncio
+import logging
 import os
 
+from calentamiento import crear_calentador
+import busqueda
+import cercania
+import enlace
+import sincronizacion
+import normalizacion
+import perfilado
+import tareas
+
 # ==========================================
 # CARGAR VARIABLES DE ENTORNO
 # ==========================================
@@ -12,6 +26,7 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGODB_URI")
 DB_FOURSQUARE = os.getenv("MONGODB_DATABASE_FOURSQUARE") or "foursquare_scraping"
 DB_GOOGLE = os.getenv("MONGODB_DATABASE_GOOGLE") or "Googlemaps_Scraping"
+ADMIN_TOKEN = os.getenv("API_ADMIN_TOKEN")
 
 if not MONGO_URI:
     raise ValueError(" Falta la variable MONGODB_URI en el archivo .env")
@@ -19,7 +34,11 @@ if not MONGO_URI:
 # ==========================================
 # CONEXIONES A MONGO
 # ==========================================
-client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where())
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    tlsCAFile=certifi.where(),
+    event_listeners=[perfilado.escucha_mongo],  # tiempos de Mongo en los perfiles
+)
 db_foursquare = client[DB_FOURSQUARE]
 db_google = client[DB_GOOGLE]
 
@@ -28,8 +47,110 @@ db_google = client[DB_GOOGLE]
 # ==========================================
 # CONFIGURACIÓN FASTAPI
 # ==========================================
-app = FastAPI(title="API Turismo - Foursquare & Google Maps", version="2.1")
+async def crear_indices():
+    """Crea los índices que necesitan los endpoints (no bloquea el arranque)."""
+    try:
+        await busqueda.crear_indice_texto(db_foursquare)
+    except Exception as e:
+        logging.error("No se pudo crear el índice de texto de tips: %s", e)
+    try:
+        await cercania.crear_indice_geo(db_foursquare)
+        await cercania.rellenar_ubicaciones(db_foursquare)
+    except Exception as e:
+        logging.error("No se pudo preparar el índice geográfico de sitios: %s", e)
+    try:
+        await enlace.crear_indices_enlace(db_foursquare)
+    except Exception as e:
+        logging.error("No se pudieron crear los índices de enlaces: %s", e)
+    try:
+        await sincronizacion.preparar_colecciones(db_foursquare)
+    except Exception as e:
+        logging.error("No se pudo preparar la sincronización incremental: %s", e)
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tareas.lanzar(crear_indices(), "crear_indices")
+    # Todos los workers la lanzan; solo vigila el que toma el liderazgo
+    vigilante = tareas.lanzar(sincronizacion.vigilar_cambios(db_foursquare), "vigilar_cambios")
+
+    # Calentamiento de los 8 departamentos en segundo plano: la API responde
+    # desde el primer momento y /warmup/estado indica cuándo está lista
+    tarea = tareas.lanzar(
+        calentador.ciclo(float(os.getenv("WARMUP_INTERVALO_S", "3000"))), "calentamiento"
+    )
+    yield
+    tarea.cancel()
+    vigilante.cancel()
+
+
+app = FastAPI(title="API Turismo - Foursquare & Google Maps", version="2.1", lifespan=lifespan)
+
+# Perfilado opcional: cabecera X-Perfilar o PERFILADO_MUESTREO (ver perfilado.py)
+app.add_middleware(perfilado.MiddlewarePerfilado, token_admin=ADMIN_TOKEN)
+
+
+def verificar_admin(token):
+    if not ADMIN_TOKEN or token != ADMIN_TOKEN:
+        raise HTTPException(403, "Token de administrador inválido")
+
+
+
+# ==========================================
+# SINCRONIZACIÓN INCREMENTAL
+# ==========================================
+DESCRIPCION_SINCE = (
+    "Token `sync_token` de una respuesta anterior o fecha ISO 8601: devuelve solo "
+    "lo insertado/modificado desde entonces (con `_id`) y los `_id` eliminados. "
+    "Con `completo: true` el since era demasiado viejo o el servidor no puede seguir "
+    "los cambios: la respuesta trae todo y reemplaza la copia local"
+)
+
+
+async def consultar_delta(coleccion: str, departamento: str, since: str, clave: str, buscar,
+                          buscar_vaciados=None):
+    """
+    Respuesta de `?since=`: documentos cambiados, eliminados y un token nuevo.
+    `buscar_vaciados(filtro)` devuelve los `_id` cambiados que ya no producen
+    registros (van con los eliminados).
+    """
+    try:
+        desde = sincronizacion.interpretar_since(since)
+    except ValueError:
+        raise HTTPException(400, "since debe ser un sync_token o una fecha ISO 8601")
+
+    try:
+        token = sincronizacion.nuevo_token()
+        # Antes del since mínimo (o sin change streams) pueden faltar cambios: se manda todo
+        completo = await sincronizacion.requiere_completo(db_foursquare, coleccion, desde)
+        if completo:
+            desde = datetime(1970, 1, 1)
+        filtro = {
+            "departamento": {"$regex": departamento, "$options": "i"},
+            **sincronizacion.filtro_desde(desde),
+        }
+        documentos = await buscar(filtro)
+        eliminados = []
+        if not completo:
+            eliminados = await sincronizacion.eliminados_desde(
+                db_foursquare, coleccion, desde, departamento
+            )
+            if buscar_vaciados is not None:
+                eliminados += await buscar_vaciados(filtro)
+
+        return {
+            "fuente": "Foursquare",
+            "departamento": departamento,
+            "since": since,
+            "sync_token": token,
+            "completo": completo,
+            "total": len(documentos),
+            clave: documentos,
+            "eliminados": eliminados,
+        }
+
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
 
 
 # ==========================================
@@ -38,26 +159,38 @@ app = FastAPI(title="API Turismo - Foursquare & Google Maps", version="2.1")
 
 # SITIOS
 
+CAMPOS_SITIOS = {
+    "nombre": 1,
+    "categoria": 1,
+    "departamento": 1,
+    "municipio": 1,
+    "latitude": 1,
+    "longitude": 1,
+}
+
 @app.get("/foursquare/sities_clean")
-async def get_foursquare_sities(departamento: str = Query(..., min_length=2)):
+async def get_foursquare_sities(
+    departamento: str = Query(..., min_length=2),
+    since: str = Query(None, description=DESCRIPCION_SINCE),
+):
     """
     Devuelve los sitios de Foursquare filtrados por departamento.
     Incluye lat/lon y categoría 
     """
+    if since:
+        return await consultar_delta(
+            "sities_clean", departamento, since, "sitios",
+            lambda filtro: db_foursquare.sities_clean.find(
+                filtro, {**CAMPOS_SITIOS, "_id": {"$toString": "$_id"}}
+            ).to_list(length=None),
+        )
+    return await calentador.cache.responder("sities_clean", departamento, consultar_sitios)
+
+
+async def consultar_sitios(departamento: str):
     try:
         filtro = {"departamento": {"$regex": departamento, "$options": "i"}}
-        cursor = db_foursquare.sities_clean.find(
-            filtro,
-            {
-                "_id": 0,
-                "nombre": 1,
-                "categoria": 1,
-                "departamento": 1,
-                "municipio": 1,
-                "latitude": 1,
-                "longitude": 1,
-            },
-        )
+        cursor = db_foursquare.sities_clean.find(filtro, {"_id": 0, **CAMPOS_SITIOS})
         sitios = await cursor.to_list(length=None)
 
         if not sitios:
@@ -70,29 +203,83 @@ async def get_foursquare_sities(departamento: str = Query(..., min_length=2)):
             "sitios": sitios,
         }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
+@app.get("/foursquare/sities_cercanos")
+async def get_foursquare_sities_cercanos(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radio_m: float = Query(None, gt=0, le=200_000, description="Solo sitios a menos de estos metros"),
+    limite: int = Query(20, ge=1, le=500, description="Cantidad máxima, del más cercano al más lejano"),
+    categoria: list[str] = Query(None, description="Repetible: categoria=Nature&categoria=Heritage"),
+    campos: str = Query(None, description="Campos a devolver separados por coma (por defecto todos)"),
+):
+    """
+    Devuelve los sitios de Foursquare más cercanos a un punto (índice 2dsphere,
+    ver cercania.py), con la distancia en metros en `distancia_m`.
+    Sirve para los k más cercanos (`limite`) y para búsquedas por radio (`radio_m`).
+    """
+    lista_campos = None
+    if campos:
+        lista_campos = [c.strip() for c in campos.split(",") if c.strip()]
+        desconocidos = set(lista_campos) - set(cercania.CAMPOS_PROYECTABLES)
+        if desconocidos:
+            raise HTTPException(
+                400, f"Campos no válidos: {', '.join(sorted(desconocidos))}. "
+                     f"Disponibles: {', '.join(cercania.CAMPOS_PROYECTABLES)}"
+            )
+
+    try:
+        sitios = await cercania.buscar_cercanos(
+            db_foursquare, lat, lon, radio_m, limite, categoria, lista_campos
+        )
+        return {
+            "fuente": "Foursquare",
+            "centro": {"lat": lat, "lon": lon},
+            "radio_m": radio_m,
+            "total": len(sitios),
+            "sitios": sitios,
+        }
+
     except Exception as e:
         raise HTTPException(500, detail=str(e))
     
 
  # RESEñANTES
 
+CAMPOS_RESEÑANTES = {
+    "nombre": 1,
+    "municipio": 1,
+    "departamento": 1
+}
+
 @app.get("/foursquare/reseñantes")
-async def get_foursquare_reviewers(departamento: str = Query(..., min_length=2)):
+async def get_foursquare_reviewers(
+    departamento: str = Query(..., min_length=2),
+    since: str = Query(None, description=DESCRIPCION_SINCE),
+):
     """
     Devuelve los reseñantes de Foursquare filtrados por departamento.
     Ideal para análisis de demanda turística.
     """
+    if since:
+        return await consultar_delta(
+            "reviewers", departamento, since, "reseñantes",
+            lambda filtro: db_foursquare.reviewers.find(
+                filtro, {**CAMPOS_RESEÑANTES, "_id": {"$toString": "$_id"}}
+            ).to_list(length=None),
+        )
+    return await calentador.cache.responder("reseñantes", departamento, consultar_reseñantes)
+
+
+async def consultar_reseñantes(departamento: str):
     try:
         filtro = {"departamento": {"$regex": departamento, "$options": "i"}}
-        cursor = db_foursquare.reviewers.find(
-            filtro,
-            {
-                "_id": 0,
-                "nombre": 1,
-                "municipio": 1,
-                "departamento": 1
-            }
-        )
+        cursor = db_foursquare.reviewers.find(filtro, {"_id": 0, **CAMPOS_RESEÑANTES})
         reseñantes = await cursor.to_list(length=None)
 
         if not reseñantes:
@@ -105,13 +292,73 @@ async def get_foursquare_reviewers(departamento: str = Query(..., min_length=2))
             "reseñantes": reseñantes
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))   
 
 # TIPS
 
+PROYECCION_TIPS = {
+    "user_id": 1,
+    "user_name": 1,
+    "user_location": 1,
+    "user_url": 1,
+    "municipio": 1,
+    "departamento": 1,
+    "fecha_actualizacion": 1,
+    "tip": "$tips",      # El tip individual
+    "tips_count": 1
+}
+
 @app.get("/foursquare/tips_expand")
-async def get_foursquare_tips_expand(departamento: str = Query(..., min_length=2)):
+async def get_foursquare_tips_expand(
+    departamento: str = Query(..., min_length=2),
+    since: str = Query(None, description=DESCRIPCION_SINCE),
+    forma: str = Query(
+        "expandida",
+        pattern="^(expandida|normalizada)$",
+        description="`normalizada`: tabla de usuarios una sola vez + tabla de tips que la referencia. "
+                    "No se combina con `since` (400)",
+    ),
+):
+    """
+    Devuelve los tips de Foursquare del departamento, un registro por tip.
+    Con `since`, el `_id` de cada registro es el del documento del usuario:
+    al hacer el merge se reemplazan todos los tips de ese usuario.
+    Con `forma=normalizada` los datos del usuario no se repiten por tip y los
+    textos repetidos van codificados con diccionario (ver normalizacion.py).
+    `since` y `forma=normalizada` no se combinan: el delta va siempre en forma
+    expandida, porque su merge por `_id` de usuario necesita un registro por tip.
+    """
+    if forma == "normalizada":
+        if since:
+            raise HTTPException(400, "since solo admite forma=expandida")
+        return await calentador.cache.responder(
+            "tips_normalizada", departamento, consultar_tips_normalizada
+        )
+    if since:
+        return await consultar_delta(
+            "tips", departamento, since, "tips",
+            lambda filtro: db_foursquare.tips.aggregate([
+                {"$match": filtro},
+                {"$unwind": "$tips"},
+                {"$project": {**PROYECCION_TIPS, "_id": {"$toString": "$_id"}}},
+            ]).to_list(length=None),
+            # Un usuario que se quedó sin tips no sale del $unwind: sus tips se borran
+            buscar_vaciados=tips_vaciados,
+        )
+    return await calentador.cache.responder("tips_expand", departamento, consultar_tips_expand)
+
+
+async def tips_vaciados(filtro: dict) -> list:
+    cursor = db_foursquare.tips.find(
+        {**filtro, "tips.0": {"$exists": False}}, {"_id": 1}
+    )
+    return [str(d["_id"]) async for d in cursor]
+
+
+async def consultar_tips_expand(departamento: str):
     
     try:
         pipeline = [
@@ -121,20 +368,7 @@ async def get_foursquare_tips_expand(departamento: str = Query(..., min_length=2
                 }
             },
             {"$unwind": "$tips"},  # Explota el array: un registro por tip
-            {
-                "$project": {
-                    "_id": 0,
-                    "user_id": 1,
-                    "user_name": 1,
-                    "user_location": 1,
-                    "user_url": 1,
-                    "municipio": 1,
-                    "departamento": 1,
-                    "fecha_actualizacion": 1,
-                    "tip": "$tips",      # El tip individual
-                    "tips_count": 1
-                }
-            }
+            {"$project": {"_id": 0, **PROYECCION_TIPS}}
         ]
 
         cursor = db_foursquare.tips.aggregate(pipeline)
@@ -153,10 +387,70 @@ async def get_foursquare_tips_expand(departamento: str = Query(..., min_length=2
             "tips": tips_list
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def consultar_tips_normalizada(departamento: str):
+    try:
+        filtro = {"departamento": {"$regex": departamento, "$options": "i"}}
+        # Sin $unwind: un documento por usuario, recorrido una sola vez
+        cursor = db_foursquare.tips.find(
+            filtro,
+            {"_id": 0, "tips": 1, **{c: 1 for c in normalizacion.CAMPOS_USUARIO}},
+        )
+        tablas = await normalizacion.tips_normalizados(cursor)
+
+        if not tablas["total_tips"]:
+            raise HTTPException(
+                404,
+                f"No se encontraron tips en el departamento {departamento}"
+            )
+
+        return {
+            "fuente": "Foursquare",
+            "departamento": departamento,
+            "forma": "normalizada",
+            **tablas,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# BÚSQUEDA EN TIPS
+
+@app.get("/foursquare/tips/buscar")
+async def buscar_tips(
+    q: str = Query(..., min_length=2, description="Palabras o \"frase exacta\"; -palabra excluye"),
+    departamento: str = Query(None, min_length=2),
+    municipio: str = Query(None, min_length=2),
+    cursor: str = Query(None, description="Valor de `siguiente` de la página anterior"),
+    limite: int = Query(20, ge=1, le=100),
+):
+    """
+    Busca en el texto de los tips (índice de texto de Mongo, español).
+    Devuelve los usuarios por relevancia con fragmentos resaltados de sus
+    tips, paginados por cursor.
+    """
+    if cursor:
+        try:
+            busqueda.decodificar_cursor(cursor)
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(400, detail=f"Cursor inválido: {e}")
+
+    try:
+        return await busqueda.buscar_tips(
+            db_foursquare, q, departamento, municipio, cursor, limite
+        )
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
 # ==========================================
 # ENDPOINT GOOGLE MAPS
 # ==========================================
@@ -166,6 +460,10 @@ async def get_google_sities(departamento: str = Query(..., min_length=2)):
     Devuelve los sitios de Google Maps filtrados solo por departamento.
     Incluye puntuación y categoría.
     """
+    return await calentador.cache.responder("google_sities", departamento, consultar_google_sities)
+
+
+async def consultar_google_sities(departamento: str):
     try:
         filtro = {"departamento": {"$regex": departamento, "$options": "i"}}
         cursor = db_google.sities.find(
@@ -191,6 +489,8 @@ async def get_google_sities(departamento: str = Query(..., min_length=2)):
             "sitios": sitios,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, detail=str(e))
     
@@ -223,6 +523,8 @@ async def get_foursquare_sities_full(departamento: str = Query(..., min_length=2
             "sitios": sitios
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, detail=str(e))
 
@@ -252,6 +554,8 @@ async def get_google_sities_full(departamento: str = Query(..., min_length=2)):
             "sitios": sitios
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, detail=str(e))
 
@@ -279,12 +583,114 @@ async def get_foursquare_reviewers_full(departamento: str = Query(..., min_lengt
             "reseñantes": reseñantes
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 
 
+# ==========================================
+# ENLACE FOURSQUARE <-> GOOGLE MAPS
+# ==========================================
+@app.get("/enlaces/sitios")
+async def get_enlaces_sitios(
+    departamento: str = Query(..., min_length=2),
+    municipio: str = Query(None, min_length=2),
+    score_min: float = Query(enlace.UMBRAL_SCORE, ge=0, le=1),
+):
+    """
+    Devuelve los sitios de Foursquare enlazados con su equivalente en Google Maps
+    (categoría de Foursquare junto a la puntuación de Google), con el score del enlace.
+    """
+    try:
+        pares = await enlace.obtener_enlaces(
+            db_foursquare, db_google, departamento, municipio, score_min
+        )
+        if not pares:
+            raise HTTPException(404, f"No hay sitios enlazados en {departamento}")
+
+        return {
+            "fuente": "Foursquare + Google Maps",
+            "departamento": departamento,
+            "total": len(pares),
+            "enlaces": pares,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
+@app.get("/enlaces/estado")
+async def estado_enlaces():
+    """Resumen de la última ejecución del enlace."""
+    return enlace.ultimo_resultado
+
+
+@app.post("/admin/enlaces/recalcular")
+async def recalcular_enlaces(completo: bool = False, x_admin_token: str = Header(None)):
+    """
+    Recalcula los enlaces en segundo plano. Por defecto solo los bloques
+    (departamento + municipio) con sitios nuevos, modificados o borrados.
+    """
+    verificar_admin(x_admin_token)
+    if not enlace.lanzar_enlace(db_foursquare, db_google, completo=completo):
+        raise HTTPException(409, "Ya hay un enlace en ejecución")
+    return {"status": "ok", "completo": completo}
+
+
+# ==========================================
+# CALENTAMIENTO (CACHÉ DEL DASHBOARD)
+# ==========================================
+calentador = crear_calentador({
+    "sities_clean": consultar_sitios,
+    "reseñantes": consultar_reseñantes,
+    "tips_normalizada": consultar_tips_normalizada,
+    "google_sities": consultar_google_sities,
+})
+
+
+@app.get("/warmup/estado")
+async def estado_calentamiento():
+    """Estado del precálculo por departamento (pendiente, calentando, listo, con_errores)."""
+    return {"listo": calentador.listo, **calentador.estado}
+
+
+@app.post("/admin/refrescar")
+async def refrescar_datos(x_admin_token: str = Header(None)):
+    """
+    Avisar después de cargar datos nuevos en Mongo: invalida el caché
+    y vuelve a calentar todos los departamentos en segundo plano.
+    """
+    verificar_admin(x_admin_token)
+    calentador.refrescar()
+    return {"status": "ok", "estado": calentador.estado["estado"]}
+
+
+# ==========================================
+# PERFILES GUARDADOS
+# ==========================================
+@app.get("/admin/perfiles")
+async def listar_perfiles(limite: int = Query(50, ge=1, le=500), x_admin_token: str = Header(None)):
+    """Perfiles recientes: ruta, parámetros, duración total y tiempo en Mongo."""
+    verificar_admin(x_admin_token)
+    perfiles = await asyncio.to_thread(perfilado.listar_perfiles, limite)
+    return {"directorio": perfilado.DIRECTORIO, "total": len(perfiles), "perfiles": perfiles}
+
+
+@app.get("/admin/perfiles/{archivo}")
+async def descargar_perfil(archivo: str, x_admin_token: str = Header(None)):
+    """Descarga un perfil (.speedscope.json para speedscope.app o el .json de metadatos)."""
+    verificar_admin(x_admin_token)
+    ruta = perfilado.ruta_perfil(archivo)
+    if ruta is None:
+        raise HTTPException(404, f"No existe el perfil {archivo}")
+    return FileResponse(ruta, filename=archivo)
+
+
 # ==========================================
 # PING DE CONEXIÓN
 # ==========================================
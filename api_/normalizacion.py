@@ -0,0 +1,86 @@
+# ======================================================
+# TIPS EN FORMA NORMALIZADA
+# ======================================================
+# En vez de repetir los datos del usuario en cada tip (lo que hace el
+# $unwind de tips_expand), se devuelven dos tablas por columnas:
+#
+#   usuarios: una fila por documento de la colección tips
+#   tips:     una fila por tip; `usuario` es la fila del usuario en `usuarios`
+#
+# Las columnas con textos muy repetidos van codificadas con diccionario:
+# la tabla lleva el código (posición en `diccionarios[columna]`, -1 = nulo).
+
+CAMPOS_USUARIO = [
+    "user_id", "user_name", "user_location", "user_url",
+    "municipio", "departamento", "fecha_actualizacion", "tips_count",
+]
+COLUMNAS_DICCIONARIO = {"user_location", "municipio", "departamento", "date"}
+
+
+class _Diccionario:
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codigo(self, valor) -> int:
+        if valor is None:
+            return -1
+        if not isinstance(valor, str):
+            valor = str(valor)
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+
+class _TablaColumnas:
+    """Tabla por columnas que admite columnas nuevas en cualquier momento."""
+
+    def __init__(self, diccionarios: dict):
+        self.columnas = {}
+        self.filas = 0
+        self._diccionarios = diccionarios
+
+    def agregar(self, fila: dict):
+        for nombre, valor in fila.items():
+            columna = self.columnas.get(nombre)
+            if columna is None:
+                relleno = -1 if nombre in COLUMNAS_DICCIONARIO else None
+                columna = self.columnas[nombre] = [relleno] * self.filas
+            if nombre in COLUMNAS_DICCIONARIO:
+                if nombre not in self._diccionarios:
+                    self._diccionarios[nombre] = _Diccionario()
+                valor = self._diccionarios[nombre].codigo(valor)
+            columna.append(valor)
+
+        self.filas += 1
+        for nombre, columna in self.columnas.items():
+            if len(columna) < self.filas:
+                columna.append(-1 if nombre in COLUMNAS_DICCIONARIO else None)
+
+
+async def tips_normalizados(cursor) -> dict:
+    """
+    Recorre el cursor de documentos de tips (uno por usuario, sin $unwind)
+    y arma las tablas `usuarios` y `tips` con sus diccionarios.
+    """
+    diccionarios = {}
+    usuarios = _TablaColumnas(diccionarios)
+    tips = _TablaColumnas(diccionarios)
+
+    async for doc in cursor:
+        fila_usuario = usuarios.filas
+        usuarios.agregar({c: doc.get(c) for c in CAMPOS_USUARIO})
+        for tip in doc.get("tips") or []:
+            if isinstance(tip, dict):
+                tips.agregar({"usuario": fila_usuario, **tip})
+
+    return {
+        "total_usuarios": usuarios.filas,
+        "total_tips": tips.filas,
+        "diccionarios": {n: d.valores for n, d in diccionarios.items()},
+        "usuarios": usuarios.columnas,
+        "tips": tips.columnas,
+    }
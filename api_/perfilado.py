@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import contextvars
+from urllib.parse import parse_qsl
+
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = None
+
+# ======================================================
+# PERFILADO OPCIONAL POR PETICIÓN
+# ======================================================
+# Se activa por petición con la cabecera `X-Perfilar: <API_ADMIN_TOKEN>` o al
+# azar con PERFILADO_MUESTREO (0.0 - 1.0). Guarda en PERFILADO_DIR:
+#   - el perfil: .speedscope.json de pyinstrument (abre en speedscope.app).
+#     Sin pyinstrument no se perfila: cProfile en el hilo del event loop
+#     mezclaría en el perfil todas las corrutinas que se intercalan.
+#   - un .json con la ruta, parámetros, duración y los comandos de Mongo
+# Desactivado cuesta una lectura de cabecera y, con muestreo, un random().
+#
+# Los comandos de Mongo se atribuyen por contextvars: solo cuentan los que
+# lanza la petición perfilada, no los de otras peticiones concurrentes, el
+# calentador o el vigilante de cambios.
+
+load_dotenv()
+log = logging.getLogger(__name__)
+
+DIRECTORIO = os.getenv("PERFILADO_DIR", "perfiles")
+MUESTREO = float(os.getenv("PERFILADO_MUESTREO", "0"))
+MAX_PERFILES = int(os.getenv("PERFILADO_MAX", "200"))
+CABECERA = b"x-perfilar"
+
+# Lista de comandos de Mongo del perfil de la petición en curso (o None)
+_comandos_perfil = contextvars.ContextVar("comandos_perfil", default=None)
+_en_curso = {}
+# pyinstrument no se puede anidar: un perfil a la vez
+_perfilando = False
+
+
+class EscuchaMongo(monitoring.CommandListener):
+    """Tiempos de los comandos de Mongo lanzados desde una petición perfilada."""
+
+    def started(self, event):
+        comandos = _comandos_perfil.get()
+        if comandos is not None:
+            _en_curso[event.request_id] = (comandos, event.command_name, event.database_name,
+                                           event.command.get(event.command_name))
+
+    def _terminar(self, event, ok):
+        inicio = _en_curso.pop(event.request_id, None)
+        if inicio is None:
+            return
+        comandos, comando, base, coleccion = inicio
+        registro = {
+            "comando": comando,
+            "base": base,
+            "coleccion": coleccion if isinstance(coleccion, str) else None,
+            "ms": round(event.duration_micros / 1000, 3),
+            "ok": ok,
+        }
+        comandos.append(registro)
+
+    def succeeded(self, event):
+        self._terminar(event, True)
+
+    def failed(self, event):
+        self._terminar(event, False)
+
+
+escucha_mongo = EscuchaMongo()
+
+
+def _debe_perfilar(scope, token_admin) -> bool:
+    valor = dict(scope["headers"]).get(CABECERA)
+    if valor is not None:
+        return bool(token_admin) and valor.decode("latin-1") == token_admin
+    return MUESTREO > 0 and random.random() < MUESTREO
+
+
+def _guardar(base: str, perfil, metadatos: dict):
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    metadatos["archivo"] = f"{base}.speedscope.json"
+    with open(os.path.join(DIRECTORIO, metadatos["archivo"]), "w") as f:
+        f.write(perfil.output(SpeedscopeRenderer()))
+
+    with open(os.path.join(DIRECTORIO, f"{base}.json"), "w") as f:
+        json.dump(metadatos, f, ensure_ascii=False, indent=1)
+
+    # Conservar solo los MAX_PERFILES más recientes
+    antiguos = sorted(listar_perfiles(limite=None), key=lambda m: m["creado"])[:-MAX_PERFILES]
+    for m in antiguos:
+        for archivo in (m["archivo"], m["base"] + ".json"):
+            try:
+                os.remove(os.path.join(DIRECTORIO, archivo))
+            except FileNotFoundError:
+                pass
+
+
+class MiddlewarePerfilado:
+    """
+    Middleware ASGI puro: sin perfil solo mira la cabecera y pasa la petición
+    tal cual (sin el envoltorio de BaseHTTPMiddleware).
+    """
+
+    def __init__(self, app, token_admin=None):
+        self.app = app
+        self.token_admin = token_admin
+        self._avisado = False
+
+    async def __call__(self, scope, receive, send):
+        global _perfilando
+        if scope["type"] != "http" or _perfilando or not _debe_perfilar(scope, self.token_admin):
+            await self.app(scope, receive, send)
+            return
+        if Profiler is None:
+            if not self._avisado:
+                log.warning("Perfilado pedido pero pyinstrument no está instalado: "
+                            "las peticiones se atienden sin perfil")
+                self._avisado = True
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        ruta = scope["path"]
+        base = f"{time.strftime('%Y%m%d-%H%M%S')}_{int(inicio * 1000) % 1000:03d}_" \
+               f"{re.sub(r'[^A-Za-z0-9]+', '_', ruta).strip('_')[:60]}"
+        estado = {}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+                mensaje = {**mensaje, "headers": [*mensaje.get("headers", []),
+                                                  (b"x-perfil", base.encode())]}
+            await send(mensaje)
+
+        comandos = []
+        _perfilando = True
+        contexto = _comandos_perfil.set(comandos)
+        perfil = Profiler(async_mode="enabled")
+        perfil.start()
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            perfil.stop()
+            _comandos_perfil.reset(contexto)
+            _perfilando = False
+
+        duracion = time.perf_counter() - inicio
+        metadatos = {
+            "base": base,
+            "metodo": scope["method"],
+            "ruta": ruta,
+            "parametros": dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"))),
+            "estado": estado.get("codigo"),
+            "duracion_ms": round(duracion * 1000, 2),
+            "mongo_ms": round(sum(c["ms"] for c in comandos), 2),
+            "mongo": list(comandos),
+            "creado": time.time(),
+        }
+        try:
+            await asyncio.to_thread(_guardar, base, perfil, metadatos)
+        except Exception as e:
+            log.error("No se pudo guardar el perfil %s: %s", base, e)
+
+
+def listar_perfiles(limite=50) -> list:
+    """Metadatos de los perfiles guardados, del más reciente al más antiguo."""
+    if not os.path.isdir(DIRECTORIO):
+        return []
+    perfiles = []
+    for nombre in os.listdir(DIRECTORIO):
+        if not nombre.endswith(".json") or nombre.endswith(".speedscope.json"):
+            continue
+        try:
+            with open(os.path.join(DIRECTORIO, nombre)) as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            continue
+        datos.pop("mongo", None)
+        perfiles.append(datos)
+    perfiles.sort(key=lambda m: m["creado"], reverse=True)
+    return perfiles[:limite] if limite else perfiles
+
+
+def ruta_perfil(nombre: str):
+    """Ruta de un archivo de perfil guardado, o None si el nombre no es válido."""
+    if not re.fullmatch(r"[A-Za-z0-9_\-]+\.(speedscope\.json|json)", nombre):
+        return None
+    ruta = os.path.join(DIRECTORIO, nombre)
+    return ruta if os.path.isfile(ruta) else None
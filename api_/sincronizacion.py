@@ -0,0 +1,342 @@
+import os
+import json
+import uuid
+import base64
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from cercania import CAMPO_UBICACION, expresion_ubicacion
+
+# ======================================================
+# SINCRONIZACIÓN INCREMENTAL (`since=`)
+# ======================================================
+# Cada documento de las colecciones sincronizables lleva `_modificado`
+# (fecha UTC de su último cambio), con índice. Un vigilante de change streams
+# lo mantiene al día y deja una marca en `sync_eliminados` por cada borrado.
+# Los clientes piden `?since=<token>` y reciben solo lo cambiado desde
+# entonces, más un token nuevo para la siguiente vez.
+#
+# Para empezar a sincronizar: since=1970-01-01T00:00:00Z (devuelve todo con _id).
+#
+# El vigilante corre en un solo proceso (el que tiene el liderazgo en
+# `sync_estado`, renovado cada pocos segundos) y guarda ahí su resume token
+# tras cada lote, así que al reiniciar sigue donde iba. Si el token ya no está
+# en el oplog, o no había token, se sube el "since mínimo" de la colección: un
+# `since` anterior recibe una resincronización completa (`completo: true`).
+# Sin change streams (Mongo sin replica set) nada marca los cambios: todo
+# `since` recibe la colección completa.
+
+log = logging.getLogger(__name__)
+
+CAMPO_MODIFICACION = "_modificado"
+COLECCION_ELIMINADOS = "sync_eliminados"
+COLECCION_ESTADO = "sync_estado"
+COLECCIONES_SYNC = ["sities_clean", "reviewers", "tips"]
+# Campos calculados por la propia API: cambiarlos no es una modificación
+CAMPOS_DERIVADOS = {CAMPO_MODIFICACION, CAMPO_UBICACION}
+
+# El token se emite un poco antes de la consulta: lo escrito durante la
+# consulta vuelve a llegar la próxima vez (el merge por _id es idempotente)
+MARGEN = timedelta(seconds=5)
+
+# Liderazgo del vigilante: vence si no se renueva (proceso caído)
+DURACION_LIDERAZGO = timedelta(seconds=30)
+RENOVACION_S = 10
+# Cada cuántos cambios seguidos se guarda el token (siempre al vaciarse el lote)
+LOTE_TOKEN = 100
+# El token ya no está en el oplog (ChangeStreamHistoryLost / ChangeStreamFatalError)
+CODIGOS_HISTORIA_PERDIDA = {280, 286}
+# Servidor anterior a 6.0: no conoce fullDocumentBeforeChange
+CODIGO_CAMPO_DESCONOCIDO = 40415
+
+
+# ---------- token ----------
+def codificar_token(momento: datetime) -> str:
+    crudo = json.dumps({"t": momento.isoformat()}).encode()
+    return base64.urlsafe_b64encode(crudo).decode()
+
+
+def interpretar_since(since: str) -> datetime:
+    """Acepta un token devuelto por la API o una fecha ISO 8601. Lanza ValueError."""
+    try:
+        texto = json.loads(base64.urlsafe_b64decode(since.encode()))["t"]
+    except Exception:
+        texto = since
+    momento = datetime.fromisoformat(texto.replace("Z", "+00:00"))
+    if momento.tzinfo is None:
+        momento = momento.replace(tzinfo=timezone.utc)
+    # Mongo guarda las fechas en UTC sin zona
+    return momento.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def nuevo_token() -> str:
+    return codificar_token(datetime.now(timezone.utc) - MARGEN)
+
+
+def filtro_desde(desde: datetime) -> dict:
+    return {CAMPO_MODIFICACION: {"$gt": desde}}
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def eliminados_desde(db, coleccion: str, desde: datetime, departamento: str) -> list:
+    """
+    `_id` borrados desde `desde` en el departamento. Las marcas sin
+    departamento (borrados sin pre-imagen) van a todos: borrar un _id que el
+    cliente no tiene no hace nada.
+    """
+    cursor = db[COLECCION_ELIMINADOS].find(
+        {
+            "coleccion": coleccion,
+            CAMPO_MODIFICACION: {"$gt": desde},
+            "$or": [
+                {"departamento": {"$regex": departamento, "$options": "i"}},
+                {"departamento": None},
+            ],
+        },
+        {"_id": 0, "doc_id": 1},
+    )
+    return [d["doc_id"] async for d in cursor]
+
+
+async def since_minimo(db, coleccion: str):
+    """Fecha antes de la cual un `since` ya no es confiable (o None)."""
+    estado = await db[COLECCION_ESTADO].find_one({"_id": f"since_minimo:{coleccion}"})
+    return estado["desde"] if estado else None
+
+
+async def requiere_completo(db, coleccion: str, desde: datetime) -> bool:
+    """True si un delta desde `desde` podría estar incompleto."""
+    vigilante = await db[COLECCION_ESTADO].find_one({"_id": f"vigilante:{coleccion}"})
+    if vigilante is not None and not vigilante.get("change_streams", True):
+        return True
+    minimo = await since_minimo(db, coleccion)
+    return minimo is not None and desde < minimo
+
+
+async def _marcar_change_streams(db, coleccion: str, disponibles: bool):
+    await db[COLECCION_ESTADO].update_one(
+        {"_id": f"vigilante:{coleccion}"},
+        {"$set": {"change_streams": disponibles, "actualizado": _ahora()}},
+        upsert=True,
+    )
+
+
+async def _subir_since_minimo(db, coleccion: str):
+    await db[COLECCION_ESTADO].update_one(
+        {"_id": f"since_minimo:{coleccion}"}, {"$max": {"desde": _ahora()}}, upsert=True
+    )
+
+
+# ---------- índices y relleno ----------
+async def preparar_colecciones(db):
+    """Índices de `_modificado` y relleno de los documentos que aún no lo tienen."""
+    for coleccion in COLECCIONES_SYNC:
+        await db[coleccion].create_index(CAMPO_MODIFICACION)
+        resultado = await db[coleccion].update_many(
+            {CAMPO_MODIFICACION: {"$exists": False}},
+            [{"$set": {CAMPO_MODIFICACION: {"$convert": {
+                "input": "$fecha_actualizacion",
+                "to": "date",
+                "onError": "$$NOW",
+                "onNull": "$$NOW",
+            }}}}],
+        )
+        if resultado.modified_count:
+            log.info("%s: %s documentos con %s rellenado",
+                     coleccion, resultado.modified_count, CAMPO_MODIFICACION)
+
+    await db[COLECCION_ELIMINADOS].create_index([("coleccion", 1), (CAMPO_MODIFICACION, 1)])
+    # Las marcas de borrado se guardan 90 días
+    await db[COLECCION_ELIMINADOS].create_index(
+        "creado", expireAfterSeconds=90 * 24 * 3600
+    )
+
+    # Pre-imágenes (MongoDB 6.0+): el departamento de un documento borrado
+    for coleccion in COLECCIONES_SYNC:
+        try:
+            await db.command("collMod", coleccion, changeStreamPreAndPostImages={"enabled": True})
+        except PyMongoError as e:
+            log.warning("%s sin pre-imágenes, las marcas de borrado irán sin departamento: %s",
+                        coleccion, e)
+
+
+# ---------- vigilante de cambios ----------
+async def _leer_token(db, coleccion: str):
+    estado = await db[COLECCION_ESTADO].find_one({"_id": f"token:{coleccion}"})
+    return estado["token"] if estado else None
+
+
+async def _guardar_token(db, coleccion: str, token):
+    await db[COLECCION_ESTADO].update_one(
+        {"_id": f"token:{coleccion}"},
+        {"$set": {"token": token, "actualizado": _ahora()}},
+        upsert=True,
+    )
+
+
+async def _vigilar_coleccion(db, coleccion: str):
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    token = await _leer_token(db, coleccion)
+    if token is None:
+        # Sin token no se sabe qué pasó antes de abrir el stream
+        await _subir_since_minimo(db, coleccion)
+    pre_imagen = {"full_document_before_change": "whenAvailable"}
+    espera = 1
+
+    while True:
+        try:
+            async with db[coleccion].watch(
+                pipeline, resume_after=token, **pre_imagen
+            ) as stream:
+                espera = 1
+                pendientes = 0
+                await _marcar_change_streams(db, coleccion, True)
+                while stream.alive:
+                    cambio = await stream.try_next()
+                    if cambio is not None:
+                        await _aplicar_cambio(db, coleccion, cambio)
+                        pendientes += 1
+                        if pendientes < LOTE_TOKEN:
+                            continue
+                    # Lote vacío (o LOTE_TOKEN cambios): guardar hasta dónde se llegó
+                    pendientes = 0
+                    if stream.resume_token is not None and stream.resume_token != token:
+                        token = stream.resume_token
+                        await _guardar_token(db, coleccion, token)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            codigo = getattr(e, "code", None)
+            # Sin replica set no hay change streams: no tiene sentido reintentar
+            if codigo == 40573:
+                log.warning("Change streams no disponibles: %s no se marcará sola, "
+                            "since devolverá la colección completa", coleccion)
+                await _marcar_change_streams(db, coleccion, False)
+                return
+            if codigo in CODIGOS_HISTORIA_PERDIDA:
+                # Los cambios perdidos no se pueden reconstruir: resincronización completa
+                log.warning("Token de %s fuera del oplog: se sube el since mínimo", coleccion)
+                await _subir_since_minimo(db, coleccion)
+                await db[COLECCION_ESTADO].delete_one({"_id": f"token:{coleccion}"})
+                token = None
+                continue
+            if codigo == CODIGO_CAMPO_DESCONOCIDO and pre_imagen:
+                log.warning("%s: el servidor no admite pre-imágenes en change streams", coleccion)
+                pre_imagen = {}
+                continue
+            log.warning("Vigilante de %s reiniciando tras error: %s", coleccion, e)
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 60)
+
+
+async def _aplicar_cambio(db, coleccion: str, cambio: dict):
+    operacion = cambio["operationType"]
+    doc_id = cambio["documentKey"]["_id"]
+    ahora = _ahora()
+
+    if operacion == "delete":
+        anterior = cambio.get("fullDocumentBeforeChange") or {}
+        await db[COLECCION_ELIMINADOS].insert_one({
+            "coleccion": coleccion,
+            "doc_id": str(doc_id),
+            "departamento": anterior.get("departamento"),
+            CAMPO_MODIFICACION: ahora,
+            "creado": ahora,
+        })
+        return
+
+    if operacion == "update":
+        campos = set(cambio.get("updateDescription", {}).get("updatedFields", {}))
+        campos |= set(cambio.get("updateDescription", {}).get("removedFields", []))
+        if campos <= CAMPOS_DERIVADOS:
+            return  # nuestra propia marca o un campo derivado
+
+    marca = {CAMPO_MODIFICACION: ahora}
+    if coleccion == "sities_clean":
+        # Las coordenadas pudieron cambiar: `ubicacion` se recalcula en la
+        # misma escritura (solo toca campos derivados, así que no vuelve aquí)
+        marca[CAMPO_UBICACION] = expresion_ubicacion()
+        await db[coleccion].update_one({"_id": doc_id}, [{"$set": marca}])
+        return
+
+    await db[coleccion].update_one({"_id": doc_id}, {"$set": marca})
+
+
+# ---------- liderazgo ----------
+async def _tomar_liderazgo(db, yo: str) -> bool:
+    """Toma o renueva el liderazgo si está libre, vencido o ya es nuestro."""
+    ahora = _ahora()
+    try:
+        await db[COLECCION_ESTADO].update_one(
+            {"_id": "lider", "$or": [{"dueño": yo}, {"vence": {"$lt": ahora}}]},
+            {"$set": {"dueño": yo, "vence": ahora + DURACION_LIDERAZGO}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False  # otro proceso lo tiene vigente
+
+
+async def _soltar_liderazgo(db, yo: str):
+    await db[COLECCION_ESTADO].update_one(
+        {"_id": "lider", "dueño": yo}, {"$set": {"vence": datetime(1970, 1, 1)}}
+    )
+
+
+async def vigilar_cambios(db):
+    """
+    Tarea de fondo: mantiene `_modificado` y las marcas de borrado. Cada
+    worker la lanza, pero solo el que tiene el liderazgo vigila.
+    """
+    yo = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    try:
+        while True:
+            try:
+                lider = await _tomar_liderazgo(db, yo)
+            except PyMongoError as e:
+                log.warning("No se pudo consultar el liderazgo del vigilante: %s", e)
+                lider = False
+            if not lider:
+                await asyncio.sleep(RENOVACION_S)
+                continue
+
+            log.info("Vigilante de cambios activo en %s", yo)
+            vigilantes = asyncio.gather(*(_vigilar_coleccion(db, c) for c in COLECCIONES_SYNC))
+            try:
+                while True:
+                    await asyncio.wait({vigilantes}, timeout=RENOVACION_S)
+                    if vigilantes.done():
+                        vigilantes.result()
+                        return  # sin change streams
+                    try:
+                        sigue = await _tomar_liderazgo(db, yo)
+                    except PyMongoError as e:
+                        log.warning("No se pudo renovar el liderazgo del vigilante: %s", e)
+                        sigue = False
+                    if not sigue:
+                        log.warning("Vigilante de cambios: liderazgo perdido en %s", yo)
+                        break
+            finally:
+                if not vigilantes.done():
+                    vigilantes.cancel()
+                    await asyncio.gather(vigilantes, return_exceptions=True)
+    finally:
+        try:
+            await _soltar_liderazgo(db, yo)
+        except PyMongoError:
+            pass  # vence solo
+
+
+if __name__ == "__main__":
+    # python sincronizacion.py  -> crea índices y rellena `_modificado`
+    from main import db_foursquare
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(preparar_colecciones(db_foursquare))
@@ -0,0 +1,26 @@
+import asyncio
+import logging
+
+# ======================================================
+# TAREAS EN SEGUNDO PLANO
+# ======================================================
+# El loop solo guarda referencias débiles a las tareas: una tarea sin otra
+# referencia puede ser recolectada a mitad de camino y su excepción se pierde.
+# Aquí se guardan hasta que terminan y los fallos quedan en el log.
+
+log = logging.getLogger(__name__)
+
+_tareas = set()
+
+
+def _terminada(tarea: asyncio.Task):
+    _tareas.discard(tarea)
+    if not tarea.cancelled() and tarea.exception() is not None:
+        log.error("La tarea %s falló", tarea.get_name(), exc_info=tarea.exception())
+
+
+def lanzar(corrutina, nombre: str) -> asyncio.Task:
+    tarea = asyncio.create_task(corrutina, name=nombre)
+    _tareas.add(tarea)
+    tarea.add_done_callback(_terminada)
+    return tarea
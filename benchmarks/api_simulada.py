@@ -0,0 +1,133 @@
+"""
+API local de reemplazo para los benchmarks: sirve datos sintéticos con la
+misma forma que los endpoints que usa el dashboard, sin Mongo.
+
+    python benchmarks/api_simulada.py --tamaño mediano --puerto 8765
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import normalizacion  # noqa: E402
+from sinteticos import generar_sitios, generar_reseñantes, generar_documentos_tips  # noqa: E402
+
+# tamaño -> (sitios, reseñantes, tips) por departamento
+TAMAÑOS = {
+    "pequeño": (500, 1_000, 5_000),
+    "mediano": (5_000, 10_000, 50_000),
+    "grande": (20_000, 40_000, 200_000),
+}
+
+def _semilla(departamento: str) -> int:
+    return sum(map(ord, departamento))
+
+
+async def _iterar(documentos):
+    for doc in documentos:
+        yield doc
+
+
+class DatosSimulados:
+    """Respuestas serializadas por (ruta, departamento, forma), generadas una sola vez."""
+
+    def __init__(self, tamaño: str):
+        self.n_sitios, self.n_reseñantes, self.n_tips = TAMAÑOS[tamaño]
+        self._respuestas = {}
+        self._lock = threading.Lock()
+
+    def _cuerpo(self, ruta: str, departamento: str, forma: str):
+        semilla = _semilla(departamento)
+        if ruta == "/foursquare/sities_clean":
+            sitios = generar_sitios(self.n_sitios, departamento, semilla)
+            return {"fuente": "Foursquare", "departamento": departamento,
+                    "total": len(sitios), "sitios": sitios}
+        if ruta == "/google/sities":
+            sitios = generar_sitios(self.n_sitios // 2, departamento, semilla, google=True)
+            for s in sitios:
+                s.pop("latitude")
+                s.pop("longitude")
+            return {"fuente": "Google Maps", "departamento": departamento,
+                    "total": len(sitios), "sitios": sitios}
+        if ruta == "/foursquare/reseñantes":
+            reseñantes = generar_reseñantes(self.n_reseñantes, departamento, semilla)
+            return {"fuente": "Foursquare", "departamento": departamento,
+                    "total": len(reseñantes), "reseñantes": reseñantes}
+        if ruta == "/foursquare/tips_expand":
+            documentos = generar_documentos_tips(self.n_tips, departamento, semilla)
+            if forma == "normalizada":
+                tablas = asyncio.run(normalizacion.tips_normalizados(_iterar(documentos)))
+                return {"fuente": "Foursquare", "departamento": departamento,
+                        "forma": "normalizada", **tablas}
+            tips = [
+                {**{c: d[c] for c in normalizacion.CAMPOS_USUARIO}, "tip": t}
+                for d in documentos for t in d["tips"]
+            ]
+            return {"fuente": "Foursquare", "departamento": departamento,
+                    "total_tips": len(tips), "tips": tips}
+        return None
+
+    def respuesta(self, ruta: str, departamento: str, forma: str):
+        clave = (ruta, departamento, forma)
+        with self._lock:
+            if clave not in self._respuestas:
+                cuerpo = self._cuerpo(ruta, departamento, forma)
+                self._respuestas[clave] = (
+                    None if cuerpo is None
+                    else json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+                )
+            return self._respuestas[clave]
+
+
+def crear_servidor(tamaño: str, puerto: int = 0) -> ThreadingHTTPServer:
+    datos = DatosSimulados(tamaño)
+
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como uvicorn
+
+        def do_GET(self):
+            partes = urlsplit(self.path)
+            parametros = parse_qs(partes.query)
+            departamento = parametros.get("departamento", [""])[0]
+            forma = parametros.get("forma", ["expandida"])[0]
+
+            cuerpo = datos.respuesta(unquote(partes.path), departamento, forma)
+            estado = 200 if cuerpo is not None else 404
+            if cuerpo is None:
+                cuerpo = b'{"detail": "Not Found"}'
+
+            self.send_response(estado)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", puerto), Manejador)
+
+
+def iniciar_en_hilo(tamaño: str) -> ThreadingHTTPServer:
+    """Arranca el servidor en un puerto libre; la URL queda en `servidor.url`."""
+    servidor = crear_servidor(tamaño)
+    servidor.url = f"http://127.0.0.1:{servidor.server_address[1]}"
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamaño", choices=list(TAMAÑOS), default="mediano")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"API simulada ({args.tamaño}) en http://127.0.0.1:{args.puerto}")
+    crear_servidor(args.tamaño, args.puerto).serve_forever()
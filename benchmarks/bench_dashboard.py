@@ -0,0 +1,172 @@
+"""
+Mide un rerun completo de dashboard_/app.py sin API real ni Mongo: levanta
+la API simulada (api_simulada.py) con datos sintéticos y ejecuta el script
+con el AppTest de Streamlit, sin navegador.
+
+Por departamento y tamaño guarda:
+  - frio_s:    primer rerun con las cachés de Streamlit vacías
+  - tibio_s:   rerun repetido (st.cache_data ya lleno), mediana de --repeticiones
+  - secciones: tiempo de cada sección del rerun frío (tiempos.Cronometro)
+  - pico_mb:   pico de memoria de Python en un rerun frío aparte (tracemalloc)
+
+    python benchmarks/bench_dashboard.py --tamaños pequeño,mediano
+    python benchmarks/bench_dashboard.py --comparar benchmarks/resultados/dashboard_abc1234.json
+
+Los resultados quedan en benchmarks/resultados/dashboard_<commit>.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(RAIZ, "dashboard_"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import api_simulada  # noqa: E402
+
+SCRIPT = os.path.join(RAIZ, "dashboard_", "app.py")
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+DEPARTAMENTOS = ["Atlántico", "Bolívar", "Magdalena"]
+TIMEOUT_S = 300
+
+
+def commit_actual() -> str:
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        )
+        return salida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "sin-git"
+
+
+def limpiar_caches():
+    import streamlit as st
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def ejecutar(departamento: str):
+    """Un rerun del script con el departamento elegido. Devuelve (segundos, AppTest)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(SCRIPT, default_timeout=TIMEOUT_S)
+    at.run()  # primer rerun: solo el sidebar, sin departamento
+    inicio = time.perf_counter()
+    at.sidebar.radio[0].set_value(departamento).run()
+    return time.perf_counter() - inicio, at
+
+
+def errores(at) -> list:
+    return [str(e.value) for e in at.exception]
+
+
+def medir_departamento(departamento: str, repeticiones: int) -> dict:
+    limpiar_caches()
+    frio, at = ejecutar(departamento)
+    secciones = dict(at.session_state["_tiempos"]) if "_tiempos" in at.session_state else {}
+    fallos = errores(at)
+
+    tibios = [ejecutar(departamento)[0] for _ in range(repeticiones)]
+
+    limpiar_caches()
+    tracemalloc.start()
+    ejecutar(departamento)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "frio_s": round(frio, 4),
+        "tibio_s": round(statistics.median(tibios), 4),
+        "secciones": {n: round(t, 4) for n, t in secciones.items()},
+        "pico_mb": round(pico / 1e6, 1),
+        "errores": fallos,
+    }
+
+
+def comparar(anterior: dict, actual: dict):
+    print(f"\n{'tamaño':<9}{'departamento':<14}{'medida':<18}"
+          f"{anterior['commit']:>10}{actual['commit']:>10}{'cambio':>9}")
+    for tamaño, deps in actual["resultados"].items():
+        for dep, r in deps.items():
+            previo = anterior["resultados"].get(tamaño, {}).get(dep)
+            if previo is None:
+                continue
+            medidas = [("frio_s", r["frio_s"], previo["frio_s"]),
+                       ("tibio_s", r["tibio_s"], previo["tibio_s"]),
+                       ("pico_mb", r["pico_mb"], previo["pico_mb"])]
+            medidas += [(f"  {n}", t, previo["secciones"].get(n))
+                        for n, t in r["secciones"].items()]
+            for nombre, ahora, antes in medidas:
+                if antes is None:
+                    continue
+                cambio = f"{(ahora / antes - 1) * 100:+.0f}%" if antes else "-"
+                print(f"{tamaño:<9}{dep:<14}{nombre:<18}{antes:>10}{ahora:>10}{cambio:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamaños", default="pequeño,mediano",
+                        help=f"separados por coma: {', '.join(api_simulada.TAMAÑOS)}")
+    parser.add_argument("--departamentos", default=",".join(DEPARTAMENTOS))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    tamaños = args.tamaños.split(",")
+    departamentos = args.departamentos.split(",")
+    for tamaño in tamaños:
+        if tamaño not in api_simulada.TAMAÑOS:
+            parser.error(f"tamaño desconocido: {tamaño}")
+
+    # Sin caché en disco ni snapshot: cada rerun frío pasa por la API
+    os.environ["DASHBOARD_CACHE_DIR"] = ""
+    os.environ["DASHBOARD_NUBE_DIR"] = ""
+    os.environ.pop("DASHBOARD_SNAPSHOT", None)
+
+    resultados = {}
+    for tamaño in tamaños:
+        servidor = api_simulada.iniciar_en_hilo(tamaño)
+        # datos y exporter leen la URL al importarse: se descartan para que AppTest los reimporte
+        os.environ["DASHBOARD_API_URL"] = servidor.url
+        for modulo in ("datos", "exporter"):
+            sys.modules.pop(modulo, None)
+
+        resultados[tamaño] = {}
+        try:
+            for dep in departamentos:
+                r = medir_departamento(dep, args.repeticiones)
+                resultados[tamaño][dep] = r
+                aviso = f"  ¡{len(r['errores'])} errores!" if r["errores"] else ""
+                print(f"{tamaño:<9}{dep:<14}frío {r['frio_s']:.2f}s  tibio {r['tibio_s']:.2f}s  "
+                      f"pico {r['pico_mb']:.0f} MB{aviso}")
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+    actual = {
+        "commit": commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "repeticiones": args.repeticiones,
+        "resultados": resultados,
+    }
+    os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_RESULTADOS, f"dashboard_{actual['commit']}.json")
+    with open(ruta, "w") as f:
+        json.dump(actual, f, ensure_ascii=False, indent=1)
+    print(f"\nResultados en {ruta}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            comparar(json.load(f), actual)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compara tiempo de escritura y tamaño de los formatos de exportación
+(xlsx, parquet, feather, csv.gz).
+
+Con datos sintéticos (sin API), escribiendo directo en los destinos:
+    python benchmarks/bench_export.py --tips 500000
+
+Contra la API real, con un departamento grande:
+    python benchmarks/bench_export.py --departamento Bolívar
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard_"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import xlsxwriter  # noqa: E402
+
+import exporter  # noqa: E402
+from sinteticos import generar_tips, generar_sitios, generar_reseñantes  # noqa: E402
+
+
+def escribir_sintetico(formato: str, datasets: dict, directorio: str):
+    """Escribe los datasets con los mismos destinos del exportador. Devuelve los bytes totales."""
+    if formato == "xlsx":
+        ruta = os.path.join(directorio, "bench.xlsx")
+        libro = xlsxwriter.Workbook(ruta, {
+            "constant_memory": True, "strings_to_numbers": False,
+            "strings_to_formulas": False, "strings_to_urls": False,
+        })
+        encabezado = libro.add_format({"bold": True})
+        destinos = {n: exporter.HojaExcel(libro, n, encabezado) for n in datasets}
+    elif formato == "csv.gz":
+        destinos = {n: exporter.CsvGz(directorio, n) for n in datasets}
+    else:
+        destinos = {n: exporter.TablaArrow(directorio, n, formato) for n in datasets}
+
+    for nombre, registros in datasets.items():
+        for registro in registros:
+            destinos[nombre].escribir(registro)
+    for destino in destinos.values():
+        destino.cerrar()
+
+    if formato == "xlsx":
+        libro.close()
+        return os.path.getsize(ruta)
+    return sum(os.path.getsize(a) for d in destinos.values() for a in d.archivos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--departamento", help="usar la API real (exporter.API_URL)")
+    parser.add_argument("--tips", type=int, default=200_000)
+    parser.add_argument("--sitios", type=int, default=20_000)
+    parser.add_argument("--formatos", default="xlsx,parquet,feather,csv.gz")
+    args = parser.parse_args()
+
+    formatos = args.formatos.split(",")
+    print(f"{'formato':>8} | {'segundos':>9} | {'MB':>8}")
+
+    if args.departamento:
+        for formato in formatos:
+            ruta, stats = asyncio.run(exporter.exportar(args.departamento, formato))
+            os.remove(ruta)
+            print(f"{formato:>8} | {stats['segundos']:>9.2f} | {stats['tamaño_mb']:>8.2f}"
+                  f"   (memoria pico {stats['memoria_pico_mb']} MB)")
+        return
+
+    datasets = {
+        "Foursquare_Sitios": generar_sitios(args.sitios),
+        "GoogleMaps_Sitios": generar_sitios(args.sitios, google=True),
+        "Foursquare_Tips": generar_tips(args.tips),
+        "Foursquare_Reseñantes": generar_reseñantes(args.tips // 20),
+    }
+    for formato in formatos:
+        with tempfile.TemporaryDirectory() as directorio:
+            inicio = time.perf_counter()
+            tamaño = escribir_sintetico(formato, datasets, directorio)
+            segundos = time.perf_counter() - inicio
+        print(f"{formato:>8} | {segundos:>9.2f} | {tamaño / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
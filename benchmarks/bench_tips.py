@@ -0,0 +1,67 @@
+"""
+Compara el procesamiento de tips anterior (dicts en una columna + .apply)
+con el actual (datos.aplanar_tips): tiempo, memoria del DataFrame resultante
+y pico de memoria durante el procesamiento (tracemalloc).
+
+    python benchmarks/bench_tips.py 10000 100000 300000
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard_"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import datos  # noqa: E402
+from sinteticos import generar_tips  # noqa: E402
+
+MESES_ANTERIOR = {
+    "Enero": 1, "Febrero": 2, "Marzo": 3, "Abril": 4,
+    "Mayo": 5, "Junio": 6, "Julio": 7, "Agosto": 8,
+    "Septiembre": 9, "Setiembre": 9, "Octubre": 10,
+    "Noviembre": 11, "Diciembre": 12
+}
+
+
+def ruta_anterior(registros):
+    df = pd.DataFrame(registros)
+    df["comment"] = df["tip"].apply(lambda t: t.get("comment", ""))
+    texto = " ".join(df["comment"]).replace('"', "")
+    df["mes"] = df["tip"].apply(lambda t: MESES_ANTERIOR.get(t.get("date", "").split()[0], None))
+    df_mes = df.dropna(subset=["mes"]).groupby("mes").size()
+    return df, texto, df_mes
+
+
+def ruta_actual(registros):
+    df = datos.aplanar_tips(registros)
+    df_mes = df["mes"].dropna().value_counts().sort_index()
+    return df, df_mes
+
+
+def medir(funcion, registros):
+    inicio = time.perf_counter()
+    funcion(registros)
+    segundos = time.perf_counter() - inicio
+
+    # Segunda pasada solo para memoria: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    resultado = funcion(registros)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, resultado[0].memory_usage(deep=True).sum(), pico
+
+
+if __name__ == "__main__":
+    tamaños = [int(x) for x in sys.argv[1:]] or [10_000, 100_000]
+
+    print(f"{'tips':>9} | {'anterior s':>10} {'df MB':>7} {'pico MB':>8} | "
+          f"{'actual s':>9} {'df MB':>7} {'pico MB':>8}")
+    for n in tamaños:
+        registros = generar_tips(n)
+        t_a, df_a, p_a = medir(ruta_anterior, registros)
+        t_n, df_n, p_n = medir(ruta_actual, registros)
+        print(f"{n:>9} | {t_a:>10.3f} {df_a / 1e6:>7.1f} {p_a / 1e6:>8.1f} | "
+              f"{t_n:>9.3f} {df_n / 1e6:>7.1f} {p_n / 1e6:>8.1f}")
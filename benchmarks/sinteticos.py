@@ -0,0 +1,115 @@
+"""Datos sintéticos con la misma forma que las respuestas de la API."""
+import random
+
+MUNICIPIOS = [
+    "Barranquilla", "Soledad", "Puerto Colombia", "Malambo", "Sabanalarga",
+    "Cartagena", "Turbaco", "Montería", "Sincelejo", "Santa Marta",
+    "Riohacha", "Valledupar", "Providencia", "Ciénaga", "Tolú",
+]
+MESES = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+    "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
+]
+PALABRAS = [
+    "playa", "precio", "comida", "servicio", "excelente", "bueno", "malo",
+    "caro", "barato", "atención", "ambiente", "vista", "mar", "pescado",
+    "cerveza", "música", "limpio", "lugar", "recomendado", "rico", "café",
+]
+
+
+def generar_tips(n: int, departamento: str = "Atlántico", seed: int = 0) -> list:
+    """`n` registros con la forma de /foursquare/tips_expand (un tip por fila)."""
+    rnd = random.Random(seed)
+    n_usuarios = max(1, n // 20)
+    usuarios = [
+        {
+            "user_id": str(100000 + i),
+            "user_name": f"Usuario {i}",
+            "user_location": rnd.choice(MUNICIPIOS),
+            "user_url": f"https://foursquare.com/user/{100000 + i}",
+            "municipio": rnd.choice(MUNICIPIOS),
+        }
+        for i in range(n_usuarios)
+    ]
+
+    registros = []
+    for i in range(n):
+        u = usuarios[i % n_usuarios]
+        registros.append({
+            **u,
+            "departamento": departamento,
+            "fecha_actualizacion": "2024-05-01",
+            "tips_count": 20,
+            "tip": {
+                "comment": " ".join(rnd.choices(PALABRAS, k=rnd.randint(4, 25))),
+                "date": f"{rnd.choice(MESES)} {rnd.randint(1, 28)}, {rnd.randint(2012, 2024)}",
+            },
+        })
+    return registros
+
+
+CATEGORIAS = [
+    "Food and Services", "Entertainment", "Heritage", "Cultural buildings",
+    "Nature", "Other", "Viewpoints",
+]
+
+
+def generar_sitios(n: int, departamento: str = "Atlántico", seed: int = 0, google: bool = False) -> list:
+    """`n` sitios con la forma de sities_clean (o de Google Maps si `google`)."""
+    rnd = random.Random(seed)
+    sitios = []
+    for i in range(n):
+        sitio = {
+            "nombre": f"{rnd.choice(PALABRAS).capitalize()} {rnd.choice(PALABRAS)} {i}",
+            "categoria": rnd.choice(CATEGORIAS),
+            "departamento": departamento,
+            "municipio": rnd.choice(MUNICIPIOS),
+            "latitude": round(10.9 + rnd.uniform(-1.5, 1.5), 6),
+            "longitude": round(-74.8 + rnd.uniform(-1.5, 1.5), 6),
+        }
+        if google:
+            sitio["puntuacion"] = round(rnd.uniform(1, 5), 1)
+        sitios.append(sitio)
+    return sitios
+
+
+def generar_reseñantes(n: int, departamento: str = "Atlántico", seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    return [
+        {
+            "nombre": f"Usuario {i}",
+            "municipio": rnd.choice(MUNICIPIOS),
+            "departamento": departamento,
+        }
+        for i in range(n)
+    ]
+
+
+def generar_documentos_tips(n_tips: int, departamento: str = "Atlántico", seed: int = 0,
+                            tips_por_usuario: int = 20) -> list:
+    """Documentos de la colección tips: uno por usuario con su array `tips`."""
+    rnd = random.Random(seed)
+    documentos = []
+    restantes, i = n_tips, 0
+    while restantes > 0:
+        n = min(restantes, rnd.randint(1, tips_por_usuario * 2 - 1))
+        documentos.append({
+            "user_id": str(100000 + i),
+            "user_name": f"Usuario {i}",
+            "user_location": rnd.choice(MUNICIPIOS),
+            "user_url": f"https://foursquare.com/user/{100000 + i}",
+            "municipio": rnd.choice(MUNICIPIOS),
+            "departamento": departamento,
+            "fecha_actualizacion": "2024-05-01",
+            "tips_count": n,
+            "tips": [
+                {
+                    "comment": " ".join(rnd.choices(PALABRAS, k=rnd.randint(4, 25))),
+                    "date": f"{rnd.choice(MESES)} {rnd.randint(1, 28)}, {rnd.randint(2012, 2024)}",
+                }
+                for _ in range(n)
+            ],
+        })
+        restantes -= n
+        i += 1
+    return documentos
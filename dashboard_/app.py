@@ -1,15 +1,20 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.express as px
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud, STOPWORDS
-from exporter import obtener_datos_completos, crear_excel
+from exporter import exportar, FORMATOS
 import asyncio
 import streamlit.components.v1 as components
 import calendar
 import plotly.graph_objects as go
-import numpy as np
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import datos
+import tiempos
+import cubo
+import snapshot
+import cache_local
+import nube
+import os
 
 # ===============================
 # CONFIGURACIÓN DE LA PÁGINA
@@ -136,101 +141,285 @@ st.markdown("""
 Visualiza la distribución de sitios turísticos y la demanda por municipio.
 """)
 
-BASE_URL = "http://127.0.0.1:8000"
-
 # ===============================
 # FUNCIONES DE CONSULTA (TODAS AQUÍ)
 # ===============================
+@st.cache_resource
+def obtener_sesion():
+    # Un solo cliente HTTP con keep-alive para todas las sesiones del servidor
+    return datos.crear_sesion()
+
+@st.cache_resource
+def obtener_snapshot():
+    # Paquete local de DASHBOARD_SNAPSHOT (modo sin API), o None
+    return snapshot.abrir_snapshot()
+
+@st.cache_resource
+def obtener_cache():
+    # Caché en disco compartido entre réplicas (DASHBOARD_CACHE_DIR)
+    return cache_local.crear_cache()
+
+def con_version(df):
+    # Huellas calculadas una vez por descarga, no en cada rerun: viajan en
+    # df.attrs, que st.cache_data conserva al copiar el DataFrame
+    df.attrs["version"] = cubo.huella(df)
+    return df
+
 @st.cache_data(ttl=600)
 def obtener_sitios(dep):
-    try:
-        resp = requests.get(f"{BASE_URL}/foursquare/sities_clean?departamento={dep}", timeout=10)
-        resp.raise_for_status()
-        return pd.DataFrame(resp.json().get("sitios", []))
-    except:
-        return pd.DataFrame()
+    sesion = obtener_sesion()
+    return con_version(obtener_cache().obtener(
+        "sitios", dep, lambda: datos.descargar(sesion, "sitios", dep)
+    ))
 
 @st.cache_data(ttl=600)
 def obtener_reseñantes(dep):
-    try:
-        resp = requests.get(f"{BASE_URL}/foursquare/reseñantes?departamento={dep}", timeout=10)
-        resp.raise_for_status()
-        return pd.DataFrame(resp.json().get("reseñantes", []))
-    except:
-        return pd.DataFrame()
+    sesion = obtener_sesion()
+    return con_version(obtener_cache().obtener(
+        "reseñantes", dep, lambda: datos.descargar(sesion, "reseñantes", dep)
+    ))
+
 @st.cache_data(ttl=600)
 def obtener_tips(dep):
-    try:
-        resp = requests.get(f"{BASE_URL}/foursquare/tips_expand?departamento={dep}", timeout=10)
-        resp.raise_for_status()
-        return pd.DataFrame(resp.json().get("tips", []))
-    except:
-        return pd.DataFrame()
+    sesion = obtener_sesion()
+    df = obtener_cache().obtener(
+        "tips", dep, lambda: datos.descargar_tips(sesion, dep)
+    )
+    if "comment" in df:
+        df.attrs["version_comentarios"] = nube.version_comentarios(df["comment"])
+    return con_version(df)
+
 @st.cache_data(ttl=600)
 def obtener_google_sities_puntuacion(dep):
-    try:
-        resp = requests.get(f"{BASE_URL}/google/sities?departamento={dep}", timeout=10)
-        resp.raise_for_status()
-        return pd.DataFrame(resp.json().get("sitios", []))
-    except:
-        return pd.DataFrame()
+    sesion = obtener_sesion()
+    return con_version(obtener_cache().obtener(
+        "google", dep, lambda: datos.descargar(sesion, "google", dep)
+    ))
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def obtener_nube_png(dep, version, directorio, _comentarios):
+    # `_comentarios` no se hashea: la clave del caché es (dep, version, directorio)
+    return nube.nube_png(
+        dep, version,
+        lambda: nube.calcular_frecuencias(_comentarios),
+        directorio=directorio,
+    )
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def obtener_cubo(dep, version, _frames):
+    # `_frames` no se hashea: la clave es (dep, huella del contenido), así que
+    # sin ttl propio: un cubo solo se reemplaza cuando cambian los datos.
+    # cache_resource: el cubo es de solo lectura y no se copia en cada rerun
+    return cubo.construir_cubo(
+        _frames["sitios"], _frames["reseñantes"], _frames["tips"], _frames["google"]
+    )
+
+def cargar_departamento(dep):
+    """
+    Descarga los 4 datasets en paralelo: el tiempo de carga queda acotado por el
+    endpoint más lento. Los errores no se cachean, así que se reintentan en el
+    siguiente rerun. En modo snapshot se leen del paquete local, sin st.cache_data:
+    copiar los DataFrames en cada rerun anularía el memory mapping.
+    """
+    fuente = obtener_snapshot()
+    if fuente is not None:
+        return datos.cargar_concurrente(
+            {nombre: lambda d, nombre=nombre: fuente.cargar(nombre, d) for nombre in snapshot.DATASETS},
+            dep,
+        )
+
+    ctx = get_script_run_ctx()
+    return datos.cargar_concurrente(
+        {
+            "sitios": obtener_sitios,
+            "reseñantes": obtener_reseñantes,
+            "tips": obtener_tips,
+            "google": obtener_google_sities_puntuacion,
+        },
+        dep,
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
 
 # ===============================
 # SIDEBAR
 # ===============================
 with st.sidebar:
     st.header("Departamento")
-    departamentos_caribe = [
-        "Atlántico", "Bolívar", "Córdoba", "Sucre",
-        "Magdalena", "La Guajira", "Cesar", "San Andrés "
-    ]
+    fuente = obtener_snapshot()
+    opciones = datos.DEPARTAMENTOS_CARIBE
+    if fuente is not None:
+        # Solo los departamentos que entraron en el paquete
+        opciones = [d for d in opciones if d in fuente.departamentos]
     departamento = st.radio(
         "Seleccione un departamento:",
-        options=departamentos_caribe,
+        options=opciones,
         index=None
     )
+    if fuente is not None:
+        st.caption(f"Modo sin conexión: snapshot {fuente.version}")
+        omitidos = fuente.manifiesto.get("omitidos") or {}
+        if omitidos:
+            st.caption(f"Sin datos en el snapshot: {', '.join(omitidos)}")
 
 # ===============================
 # DESCARGA DE EXCEL COMPLETO
 # ===============================
-if departamento:
+if departamento and fuente is not None:
+    st.sidebar.markdown("---")
+    st.sidebar.caption("La exportación completa necesita la API: no está disponible en modo snapshot.")
+
+elif departamento:
     st.sidebar.markdown("---")
     st.sidebar.subheader(" Exportar datos completos")
 
-    # Botón que genera el archivo Excel
-    if st.sidebar.button("Generar archivo Excel"):
-        with st.spinner("Generando archivo Excel..."):
+    formato = st.sidebar.selectbox(
+        "Formato",
+        options=list(FORMATOS),
+        format_func=lambda f: {
+            "xlsx": "Excel (.xlsx)",
+            "parquet": "Parquet (zip)",
+            "feather": "Feather (zip)",
+            "csv.gz": "CSV comprimido (zip)",
+        }[f],
+    )
 
-            # Llamar los 4 endpoints completos
-            dataframes = asyncio.run(obtener_datos_completos(departamento))
+    # Botón que genera el archivo
+    if st.sidebar.button("Generar archivo"):
+        with st.spinner("Generando archivo..."):
+
+            # Descarga los 4 endpoints completos en paralelo y escribe los
+            # datos a medida que llegan los registros (archivo temporal)
+            ruta_export, stats = asyncio.run(exportar(departamento, formato))
+
+        for hoja, error in stats["errores"].items():
+            st.sidebar.warning(f"{hoja}: {error}")
+        if stats["vacios"]:
+            st.sidebar.info(f"Sin registros: {', '.join(stats['vacios'])}")
+        if not stats["streaming"]:
+            st.sidebar.warning(
+                "ijson no está instalado: los datos se leyeron completos en memoria "
+                "(pip install ijson)."
+            )
+        if stats["descartados"]:
+            st.sidebar.warning(
+                f"{stats['descartados']:,} valores no encajaban en el tipo de su columna "
+                "y quedaron vacíos en el archivo."
+            )
+        st.sidebar.success("Archivo listo para descargar ✔️")
+        st.sidebar.caption(
+            f"{sum(stats['filas'].values()):,} filas en {len(stats['archivos'])} "
+            f"{'hojas' if formato == 'xlsx' else 'archivos'} · "
+            f"{stats['tamaño_mb']} MB · {stats['segundos']} s · "
+            f"memoria pico {stats['memoria_pico_mb']} MB"
+        )
 
-            # Crear el archivo Excel con varias hojas
-            excel_file = crear_excel(dataframes)
+        # Botón de descarga
+        extension, mime = FORMATOS[formato]
+        try:
+            with open(ruta_export, "rb") as archivo:
+                st.sidebar.download_button(
+                    label="⬇ Descargar Archivo",
+                    data=archivo,
+                    file_name=f"Datos_Completos_{departamento}.{extension}",
+                    mime=mime
+                )
+        finally:
+            os.remove(ruta_export)
 
-        st.sidebar.success("Archivo Excel listo para descargar ✔️")
+# ===============================
+# FILTROS CRUZADOS
+# ===============================
+TRADUCCION_CATEGORIAS = {
+    "Food and Services": "Comida y Servicios",
+    "Entertainment": "Entretenimiento",
+    "Heritage": "Patrimonio",
+    "Cultural buildings": "Edificios Culturales",
+    "Nature": "Naturaleza",
+    "Other": "Otros",
+    "Viewpoints": "Miradores"
+}
+GRAFICOS_SELECCIONABLES = ["grafico_demanda", "grafico_linea"]
+
+def nombre_mes(m):
+    return calendar.month_name[int(m)].capitalize() if 1 <= int(m) <= 12 else "Desconocido"
+
+def quitar_filtros():
+    for eje in cubo.EJES:
+        st.session_state[f"filtro_{eje}"] = []
+
+def seleccionar_desde_grafico(clave, eje, campo):
+    # Clic en un gráfico: sus puntos seleccionados pasan a ser el filtro del eje
+    evento = st.session_state.get(clave)
+    puntos = evento["selection"]["points"] if evento else []
+    valores = [int(p[campo]) if eje == "mes" else p[campo] for p in puntos if campo in p]
+    st.session_state[f"filtro_{eje}"] = list(dict.fromkeys(valores))
+
+def mostrar_filtros(cubo_dep, dep):
+    """Filtros de municipio, categoría y mes en el sidebar. Devuelve {eje: seleccionados}."""
+    # Al cambiar de departamento las selecciones anteriores ya no aplican
+    if st.session_state.get("_filtros_departamento") != dep:
+        for clave in [f"filtro_{eje}" for eje in cubo.EJES] + GRAFICOS_SELECCIONABLES:
+            st.session_state.pop(clave, None)
+        st.session_state["_filtros_departamento"] = dep
 
-        # Botón de descarga
-        st.sidebar.download_button(
-            label="⬇ Descargar Archivo",
-            data=excel_file,
-            file_name=f"Datos_Completos_{departamento}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+    st.sidebar.markdown("---")
+    st.sidebar.subheader(" Filtros")
+    st.sidebar.multiselect(
+        "Municipio", options=cubo_dep.etiquetas["municipio"].tolist(), key="filtro_municipio"
+    )
+    st.sidebar.multiselect(
+        "Categoría", options=cubo_dep.etiquetas["categoria"].tolist(), key="filtro_categoria",
+        format_func=lambda c: TRADUCCION_CATEGORIAS.get(c, c),
+    )
+    st.sidebar.multiselect(
+        "Mes", options=cubo_dep.etiquetas["mes"].tolist(), key="filtro_mes", format_func=nombre_mes
+    )
+    filtros = {eje: st.session_state.get(f"filtro_{eje}") or [] for eje in cubo.EJES}
+    if any(filtros.values()):
+        st.sidebar.button("Quitar filtros", on_click=quitar_filtros)
+        st.sidebar.caption("También se filtra con clic en las barras de demanda y en la línea temporal.")
+    return filtros
 
 # ===============================
 # CUERPO PRINCIPAL
 # ===============================
+crono = tiempos.Cronometro(st.session_state)
+
 if departamento:
-    df_sities = obtener_sitios(departamento)
-    df_reviewers = obtener_reseñantes(departamento)
-    df_tips = obtener_tips(departamento)
-    df_google = obtener_google_sities_puntuacion(departamento)  
+    crono.seccion("carga")
+    frames, errores = cargar_departamento(departamento)
+    df_sities = frames["sitios"]
+    df_reviewers = frames["reseñantes"]
+    df_tips = frames["tips"]
+    df_google = frames["google"]
+
+    # Agregados precalculados: los filtros se responden sumando arrays del cubo
+    crono.seccion("cubo")
+    if fuente is not None:
+        try:
+            cubo_dep = fuente.cubo(departamento)  # precalculado en el paquete
+        except (LookupError, OSError) as e:
+            st.warning(f"No hay datos de {departamento} en el snapshot: {e}")
+            st.stop()
+    else:
+        cubo_dep = obtener_cubo(departamento, cubo.version_frames(frames), frames)
+    filtros = mostrar_filtros(cubo_dep, departamento)
+
+    # Fallos parciales: se muestran las secciones que sí cargaron
+    for nombre, error in errores.items():
+        st.warning(f"No se pudieron cargar los datos de {nombre}: {error}")
 
     if df_sities.empty:
         st.warning("No se encontraron sitios para este departamento.")
     else:
 
         # TARJETAS PRINCIPALES
+        crono.seccion("tarjetas")
+
+        def total(medida, df):
+            # Sin filtros, todas las filas; con filtros, el cubo
+            return int(cubo_dep.total(medida, filtros)) if any(filtros.values()) else len(df)
+
         st.markdown("###  Indicadores Generales")
 
         c1, c2, c3 = st.columns(3)
@@ -239,21 +428,21 @@ if departamento:
             st.markdown(f"""
             <div class="card">
                 <h4>Total de Sitios</h4>
-                <p>{len(df_sities):,}</p>
+                <p>{total("sitios", df_sities):,}</p>
             </div>""", unsafe_allow_html=True)
 
         with c2:
             st.markdown(f"""
             <div class="card">
                 <h4>Total de Reseñantes</h4>
-                <p>{len(df_reviewers):,}</p>
+                <p>{total("reseñantes", df_reviewers):,}</p>
             </div>""", unsafe_allow_html=True)
 
         with c3:
             st.markdown(f"""
             <div class="card">
                 <h4>Total de Tips</h4>
-                <p>{len(df_tips):,}</p>
+                <p>{total("tips", df_tips):,}</p>
             </div>""", unsafe_allow_html=True)
 
         st.markdown("---")
@@ -264,7 +453,9 @@ if departamento:
         col1, col2 = st.columns([2.8, 1.0])
 
         # ------------ MAPA ------------
+        crono.seccion("mapa")
         with col1:
+            df_sities = df_sities[cubo.mascara_sitios(df_sities, filtros)]
             df_sities = df_sities.dropna(subset=["latitude", "longitude"])
             df_grouped = (
                 df_sities
@@ -299,6 +490,7 @@ if departamento:
             st.plotly_chart(fig_map, width="stretch")
 
         # ------------ CATEGORÍAS ------------
+        crono.seccion("categorias")
         with col2:
         # título
             st.markdown("""
@@ -307,24 +499,14 @@ if departamento:
                 </h5>
             """, unsafe_allow_html=True)
 
-            trad = {
-                "Food and Services": "Comida y Servicios",
-                "Entertainment": "Entretenimiento",
-                "Heritage": "Patrimonio",
-                "Cultural buildings": "Edificios Culturales",
-                "Nature": "Naturaleza",
-                "Other": "Otros",
-                "Viewpoints": "Miradores"
-            }
-
-            df_sities["categoria"] = df_sities["categoria"].replace(trad)
-
+            # Filtrado cruzado: las barras de categoría no se filtran por categoría
+            por_categoria = cubo_dep.serie("sitios", "categoria", cubo.sin(filtros, "categoria"))
             df_top = (
-                df_sities.groupby("categoria")
-                .size()
+                por_categoria[por_categoria > 0]
                 .reset_index(name="cantidad")
                 .sort_values("cantidad", ascending=False)
             )
+            df_top["nombre"] = df_top["categoria"].map(lambda c: TRADUCCION_CATEGORIAS.get(c, c))
 
             # Si no hay datos, mostrar mensaje
             if df_top.empty:
@@ -353,11 +535,13 @@ if departamento:
                 rows_html = ""
                 for row in df_top.itertuples():
                     pct = (row.cantidad / max_val) * 100 if max_val > 0 else 0
+                    # Con filtro de categoría, las no seleccionadas quedan atenuadas
+                    opacidad = 0.35 if filtros["categoria"] and row.categoria not in filtros["categoria"] else 1
 
                     rows_html += f"""
-                    <div style="margin-bottom:14px;">
+                    <div style="margin-bottom:14px; opacity:{opacidad};">
                         <div style="font-size:13px; font-weight:600; color:#444; margin-bottom:6px;">
-                            {row.categoria}
+                            {row.nombre}
                         </div>
                         <div style="display:flex; align-items:center;">
                             <div style="flex:1; height:16px; background:#f2f2f2; border-radius:8px; margin-right:10px; overflow:hidden;">
@@ -396,11 +580,13 @@ if departamento:
         col3, col4 = st.columns(2)
 
         # --- Demanda Turística
+        crono.seccion("demanda")
         with col3:
             if df_reviewers.empty:
                 st.warning("No se encontraron reseñantes para este departamento.")
             else:
-                df_count = df_reviewers.groupby("municipio").size().reset_index(name="Número de Reseñantes")
+                por_municipio = cubo_dep.serie("reseñantes", "municipio", cubo.sin(filtros, "municipio"))
+                df_count = por_municipio[por_municipio > 0].reset_index(name="Número de Reseñantes")
                 df_count = df_count.sort_values("Número de Reseñantes", ascending=False)
 
                 fig_demand = px.bar(
@@ -429,24 +615,32 @@ if departamento:
                     margin=dict(l=20, r=20, t=50, b=80),
                     plot_bgcolor="white"
                 )
-                st.plotly_chart(fig_demand, use_container_width=True)
+                # Municipios seleccionados resaltados (una traza por municipio)
+                if filtros["municipio"]:
+                    for trace in fig_demand.data:
+                        trace.opacity = 1 if trace.name in filtros["municipio"] else 0.3
+
+                st.plotly_chart(
+                    fig_demand, use_container_width=True,
+                    key="grafico_demanda", selection_mode="points",
+                    on_select=lambda: seleccionar_desde_grafico("grafico_demanda", "municipio", "x"),
+                )
 
 
         # ------------ PROMEDIO DE PUNTUACIÓN ------------
+        crono.seccion("puntuacion")
         with col4:
             try:
-                data_google = obtener_google_sities_puntuacion(departamento)
-                df_google = pd.DataFrame(data_google)
-
-                if not df_google.empty:
-
-                    # --- Agrupación ---
-                    df_promedio = (
-                        df_google.groupby(["municipio", "categoria"])["puntuacion"]
-                        .mean()
-                        .reset_index()
-                    )
+                # --- Agrupación (sumas y conteos del cubo) ---
+                suma = cubo_dep.serie("google_suma", ["municipio", "categoria"], filtros)
+                n = cubo_dep.serie("google_n", ["municipio", "categoria"], filtros)
+                df_promedio = (suma[n > 0] / n[n > 0]).rename("puntuacion").reset_index()
 
+                if df_google.empty:
+                    st.info("No se encontraron sitios en Google Maps para este departamento.")
+                elif df_promedio.empty:
+                    st.info("No hay puntuaciones con los filtros seleccionados.")
+                else:
                     # Ordenar de menor a mayor (para barras horizontales)
                     df_promedio = df_promedio.sort_values("puntuacion", ascending=True)
 
@@ -496,9 +690,6 @@ if departamento:
 
                     st.plotly_chart(fig_puntuacion, use_container_width=True)
 
-                else:
-                    st.info("No se encontraron sitios en Google Maps para este departamento.")
-
             except Exception as e:
                 st.error(f"Error al obtener datos: {e}")
 
@@ -515,33 +706,26 @@ if departamento:
         # ============================================================
         if df_tips.empty:
             st.info("No hay tips en Foursquare.")
-            texto_tips = ""
+            png_nube = None
         else:
-            df_tips["comment"] = df_tips["tip"].apply(lambda t: t.get("comment", ""))
-
-            texto_tips = " ".join(df_tips["comment"]).replace('"', "")
-            stopwords_es = STOPWORDS.union({
-                "el", "la", "los", "las", "un", "una", "unos", "unas", "yo",
-                "que", "de", "del", "al", "y", "o", "a", "en", "es", "Con", "con"
-            })
-
-            # ===== Crear columna MES numérica =====
-            meses_map = {
-                "Enero": 1, "Febrero": 2, "Marzo": 3, "Abril": 4,
-                "Mayo": 5, "Junio": 6, "Julio": 7, "Agosto": 8,
-                "Septiembre": 9, "Setiembre": 9, "Octubre": 10,
-                "Noviembre": 11, "Diciembre": 12
-            }
-
-            df_tips["mes"] = df_tips["tip"].apply(
-                lambda t: meses_map.get(t.get("date", "").split()[0], None)
+            # La nube solo se genera una vez por (departamento, versión de los tips);
+            # el snapshot ya la trae renderizada
+            crono.seccion("nube")
+            if fuente is not None:
+                version_nube = fuente.version_comentarios(departamento)
+                directorio_nube = fuente.directorio_nubes
+            else:
+                version_nube = df_tips.attrs.get("version_comentarios") \
+                    or nube.version_comentarios(df_tips["comment"])
+                directorio_nube = os.getenv("DASHBOARD_NUBE_DIR")
+            png_nube = obtener_nube_png(
+                departamento, version_nube, directorio_nube, df_tips["comment"],
             )
 
-            # ===== Agrupar =====
-            df_mes = df_tips.dropna(subset=["mes"]) \
-                            .groupby("mes") \
-                            .size() \
-                            .reset_index(name="total_tips")
+            crono.seccion("linea_temporal")
+            # ===== Agrupar (tips por mes del cubo; la línea no se filtra por mes) =====
+            por_mes = cubo_dep.serie("tips", "mes", cubo.sin(filtros, "mes"))
+            df_mes = por_mes[por_mes > 0].reset_index(name="total_tips")
 
         # ============================================================
         #         ASEGURAR df_mes PARA EVITAR NameError SI NO EXISTE
@@ -556,9 +740,7 @@ if departamento:
             st.warning("No hay actividad temporal.")
             df_mes = pd.DataFrame({"mes": [], "total_tips": [], "mes_nombre": []})
         else:
-            df_mes["mes_nombre"] = df_mes["mes"].astype(int).apply(
-                lambda m: calendar.month_name[m].capitalize() if 1 <= m <= 12 else "Desconocido"
-            )
+            df_mes["mes_nombre"] = df_mes["mes"].astype(int).apply(nombre_mes)
 
         # ============================================================
         #                     DISEÑO DE COLUMNAS
@@ -566,8 +748,6 @@ if departamento:
         col_wc, col_time = st.columns([1, 1])
 
         # Tamaño estandarizado de ambas (grandes)
-        WC_WIDTH  = 7      # pulgadas (matplotlib)
-        WC_HEIGHT = 5
         LINE_WIDTH = 750   # px (plotly)
         LINE_HEIGHT = 450  # px
 
@@ -577,37 +757,26 @@ if departamento:
         # ============================================================
         #                        NUBE DE PALABRAS
         # ============================================================
+        crono.seccion("nube")
         with col_wc:
-           
 
-            if len(texto_tips.split()) < 3:
+            if png_nube is None:
                 st.info("No hay suficientes palabras para generar una nube.")
             else:
-                fig_wc, ax_wc = plt.subplots(figsize=(9, 6), dpi=100)
-                def color_func(word, font_size, position, orientation, random_state=None, **kwargs):
-                    return np.random.choice(paleta_wc)
-
-                wc = WordCloud(
-                    width=2500, height=1800,
-                    background_color="white",
-                    stopwords=stopwords_es
-                ).generate(texto_tips)
-
-                ax_wc.imshow(wc, interpolation="bilinear")
-                ax_wc.axis("off")
-
-                st.pyplot(fig_wc)
+                st.image(png_nube, width="stretch")
+                if any(filtros.values()):
+                    st.caption("La nube de palabras usa todos los tips del departamento.")
 
         # ============================================================
         #                        LÍNEA TEMPORAL
         # ============================================================
+        crono.seccion("linea_temporal")
         with col_time:
-            
             if df_mes.empty:
                 st.info("No hay datos para mostrar la actividad temporal.")
             else:
                 # Valores
-                x_vals = list(range(1, len(df_mes)+1))  # 1,2,3,...
+                x_vals = df_mes["mes"].astype(int).tolist()  # número de mes
                 y_vals = df_mes["total_tips"].tolist()
                 hover_texts = df_mes["mes_nombre"].tolist()
 
@@ -636,4 +805,10 @@ if departamento:
                     margin=dict(l=50, r=50, t=30, b=50)
                     )
 
-                st.plotly_chart(fig_linea, use_container_width=False, config={"responsive": False})
\ No newline at end of file
+                st.plotly_chart(
+                    fig_linea, use_container_width=False, config={"responsive": False},
+                    key="grafico_linea", selection_mode="points",
+                    on_select=lambda: seleccionar_desde_grafico("grafico_linea", "mes", "x"),
+                )
+
+crono.fin()
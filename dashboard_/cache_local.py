@@ -0,0 +1,196 @@
+import os
+import time
+import socket
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+# ======================================================
+# CACHÉ PERSISTENTE COMPARTIDO ENTRE RÉPLICAS
+# ======================================================
+# Los DataFrames se guardan como Parquet en un directorio (local o volumen
+# compartido) con un índice SQLite. Cualquier proceso que apunte al mismo
+# directorio reutiliza las descargas de los demás y arranca "en caliente".
+#
+# El índice usa el journal clásico de SQLite (rollback + bloqueos de archivo),
+# no WAL: WAL necesita memoria compartida y solo funciona entre procesos del
+# mismo host. En un volumen de red el sistema de archivos debe soportar
+# bloqueos POSIX (NFSv4, o NFSv3 con lockd). Cada Parquet se escribe en un
+# temporal propio del host/proceso/hilo y se publica con un rename atómico.
+#
+#   DASHBOARD_CACHE_DIR       directorio del caché (si no existe, no hay caché)
+#   DASHBOARD_CACHE_MAX_MB    tamaño máximo antes de expulsar por LRU (def. 2048)
+#   DASHBOARD_CACHE_FRESCO_S  segundos en que una entrada se sirve sin refrescar (def. 600)
+#   DASHBOARD_CACHE_OBSOLETO_S segundos en que se sirve obsoleta mientras se refresca (def. 86400)
+#   DASHBOARD_DATOS_VERSION   versión de los datos; al cambiarla se ignoran las entradas viejas
+
+log = logging.getLogger(__name__)
+
+
+class SinCache:
+    """Implementación nula: siempre descarga."""
+
+    def obtener(self, endpoint: str, departamento: str, cargar) -> pd.DataFrame:
+        return cargar()
+
+
+class CacheParquet(SinCache):
+
+    def __init__(self, directorio: str, max_bytes: int, fresco_s: float,
+                 obsoleto_s: float, version: str = "1"):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.fresco_s = fresco_s
+        self.obsoleto_s = obsoleto_s
+        self.version = version
+        self._refrescando = set()
+        self._lock = threading.Lock()
+
+        os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=DELETE")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS entradas (
+                    clave TEXT PRIMARY KEY,
+                    archivo TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    creado REAL NOT NULL,
+                    usado REAL NOT NULL,
+                    refrescando_hasta REAL NOT NULL DEFAULT 0
+                )
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS entradas_usado ON entradas(usado)")
+
+    # ---------- índice ----------
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(os.path.join(self.directorio, "indice.sqlite"), timeout=30)
+        try:
+            with con:  # commit al salir
+                yield con
+        finally:
+            con.close()
+
+    def _clave(self, endpoint, departamento):
+        return f"{endpoint}|{departamento.strip().lower()}|{self.version}"
+
+    def _buscar(self, clave):
+        with self._conectar() as con:
+            fila = con.execute(
+                "SELECT archivo, creado FROM entradas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila:
+                con.execute("UPDATE entradas SET usado = ? WHERE clave = ?", (time.time(), clave))
+        return fila
+
+    # ---------- lectura / escritura ----------
+    def _leer(self, archivo):
+        return pd.read_parquet(os.path.join(self.directorio, archivo))
+
+    def _guardar(self, clave, df):
+        archivo = hashlib.sha1(clave.encode()).hexdigest()[:24] + ".parquet"
+        ruta = os.path.join(self.directorio, archivo)
+        # El pid solo es único en un host: el nombre del host evita choques entre réplicas
+        temporal = f"{ruta}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        df.to_parquet(temporal, index=False)
+        os.replace(temporal, ruta)
+
+        ahora = time.time()
+        with self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO entradas (clave, archivo, bytes, creado, usado) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (clave, archivo, os.path.getsize(ruta), ahora, ahora),
+            )
+        self._expulsar()
+
+    def _expulsar(self):
+        """Borra las entradas usadas hace más tiempo hasta quedar bajo max_bytes."""
+        with self._conectar() as con:
+            total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM entradas").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for clave, archivo, tam in con.execute(
+                "SELECT clave, archivo, bytes FROM entradas ORDER BY usado"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                con.execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+                try:
+                    os.remove(os.path.join(self.directorio, archivo))
+                except FileNotFoundError:
+                    pass
+                total -= tam
+
+    # ---------- stale-while-revalidate ----------
+    def _tomar_refresco(self, clave):
+        """Solo un proceso/hilo refresca cada clave a la vez."""
+        ahora = time.time()
+        with self._lock:
+            if clave in self._refrescando:
+                return False
+            with self._conectar() as con:
+                cur = con.execute(
+                    "UPDATE entradas SET refrescando_hasta = ? "
+                    "WHERE clave = ? AND refrescando_hasta < ?",
+                    (ahora + 120, clave, ahora),
+                )
+            if cur.rowcount != 1:
+                return False
+            self._refrescando.add(clave)
+            return True
+
+    def _refrescar(self, clave, cargar):
+        try:
+            self._guardar(clave, cargar())
+        except Exception as e:
+            log.warning("No se pudo refrescar %s: %s", clave, e)
+        finally:
+            with self._lock:
+                self._refrescando.discard(clave)
+
+    def obtener(self, endpoint: str, departamento: str, cargar) -> pd.DataFrame:
+        clave = self._clave(endpoint, departamento)
+        fila = self._buscar(clave)
+
+        if fila:
+            archivo, creado = fila
+            edad = time.time() - creado
+            if edad < self.obsoleto_s:
+                try:
+                    df = self._leer(archivo)
+                except Exception as e:
+                    log.warning("Entrada de caché ilegible %s: %s", clave, e)
+                else:
+                    if edad >= self.fresco_s and self._tomar_refresco(clave):
+                        threading.Thread(
+                            target=self._refrescar, args=(clave, cargar), daemon=True
+                        ).start()
+                    return df
+
+        df = cargar()
+        try:
+            self._guardar(clave, df)
+        except Exception as e:
+            log.warning("No se pudo guardar %s en caché: %s", clave, e)
+        return df
+
+
+def crear_cache() -> SinCache:
+    """Construye el caché configurado por variables de entorno."""
+    directorio = os.getenv("DASHBOARD_CACHE_DIR")
+    if not directorio:
+        return SinCache()
+
+    return CacheParquet(
+        directorio,
+        max_bytes=int(float(os.getenv("DASHBOARD_CACHE_MAX_MB", "2048")) * 1024 * 1024),
+        fresco_s=float(os.getenv("DASHBOARD_CACHE_FRESCO_S", "600")),
+        obsoleto_s=float(os.getenv("DASHBOARD_CACHE_OBSOLETO_S", "86400")),
+        version=os.getenv("DASHBOARD_DATOS_VERSION", "1"),
+    )
@@ -0,0 +1,201 @@
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# CUBO DE AGREGADOS PARA EL FILTRADO CRUZADO
+# ======================================================
+# Por departamento se precalculan los conteos por municipio × categoría × mes
+# en arrays NumPy (un eje = un código categórico). Cada medida tiene solo los
+# ejes que existen en su dataset:
+#
+#   sitios         municipio × categoria
+#   reseñantes     municipio
+#   tips           municipio × mes
+#   google_n       municipio × categoria   (sitios de Google con puntuación)
+#   google_suma    municipio × categoria   (suma de puntuaciones)
+#
+# Un filtro sobre un eje que la medida no tiene no la afecta. Filtrar es
+# indexar y sumar arrays pequeños, sin volver a agrupar los DataFrames.
+#
+# Cada eje tiene una posición extra al final para las filas con el valor nulo,
+# vacío o fuera de las etiquetas (un sitio sin municipio, un tip sin mes): no
+# aparecen en las series por ese eje ni pasan un filtro sobre él, pero sí
+# cuentan en los totales y en las series por otros ejes.
+
+EJES = ("municipio", "categoria", "mes")
+MESES = np.arange(1, 13)
+
+
+def _etiquetas(*series) -> np.ndarray:
+    valores = set()
+    for s in series:
+        if s is not None:
+            valores.update(v for v in pd.unique(s.dropna()) if str(v).strip())
+    return np.array(sorted(valores, key=str), dtype=object)
+
+
+def _codigos(serie, etiquetas: np.ndarray) -> np.ndarray:
+    """Código de cada fila en `etiquetas` (-1 si es nulo o no está)."""
+    return pd.Index(etiquetas).get_indexer(np.asarray(serie, dtype=object)).astype(np.int32)
+
+
+def _contar(codigos: list, forma: tuple, pesos=None) -> np.ndarray:
+    """
+    Conteo (o suma de `pesos`) por combinación de códigos, con bincount.
+    `forma` incluye la posición de desconocidos de cada eje, donde van los -1.
+    """
+    codigos = [np.where(c >= 0, c, n - 1) for c, n in zip(codigos, forma)]
+    if pesos is not None:
+        validos = ~np.isnan(pesos)
+        codigos = [c[validos] for c in codigos]
+        pesos = pesos[validos]
+    plano = np.ravel_multi_index(codigos, forma)
+    return np.bincount(plano, weights=pesos, minlength=int(np.prod(forma))).reshape(forma)
+
+
+class Cubo:
+    """
+    Agregados de un departamento. `filtros` es siempre un dict
+    eje -> lista de etiquetas seleccionadas (vacía o ausente = sin filtro).
+    """
+
+    def __init__(self, etiquetas: dict, medidas: dict):
+        self.etiquetas = etiquetas   # eje -> np.ndarray (posición = código)
+        self.medidas = medidas       # nombre -> (ejes, array)
+        self._posiciones = {
+            eje: {v: i for i, v in enumerate(valores.tolist())} for eje, valores in etiquetas.items()
+        }
+
+    def codigos(self, eje: str, valores) -> np.ndarray:
+        posiciones = self._posiciones[eje]
+        return np.array([posiciones[v] for v in valores if v in posiciones], dtype=np.intp)
+
+    def _recortar(self, medida: str, filtros: dict):
+        # Los ejes sin filtro conservan la posición de desconocidos (la última)
+        ejes, arr = self.medidas[medida]
+        etiquetas = [self.etiquetas[e] for e in ejes]
+        for i, eje in enumerate(ejes):
+            seleccion = (filtros or {}).get(eje)
+            if seleccion:
+                codigos = self.codigos(eje, seleccion)
+                arr = arr.take(codigos, axis=i)
+                etiquetas[i] = etiquetas[i][codigos]
+        return ejes, arr, etiquetas
+
+    def total(self, medida: str, filtros: dict = None) -> float:
+        return self._recortar(medida, filtros)[1].sum()
+
+    def serie(self, medida: str, por, filtros: dict = None) -> pd.Series:
+        """
+        Total de `medida` por uno o varios ejes (`por`), con los filtros
+        aplicados. Para el filtrado cruzado, quitar de `filtros` el eje del
+        propio gráfico (ver `sin`).
+        """
+        por = (por,) if isinstance(por, str) else tuple(por)
+        ejes, arr, etiquetas = self._recortar(medida, filtros)
+        quedan = [ejes.index(e) for e in por]
+        arr = arr.sum(axis=tuple(i for i in range(arr.ndim) if i not in quedan))
+        # Los ejes que quedan van en el orden de la medida: pasarlos al de `por`
+        arr = arr.transpose([sorted(quedan).index(i) for i in quedan])
+        # Sin la posición de desconocidos: la serie solo tiene etiquetas conocidas
+        arr = arr[tuple(slice(len(etiquetas[i])) for i in quedan)]
+
+        if len(por) == 1:
+            indice = pd.Index(etiquetas[quedan[0]], name=por[0])
+        else:
+            indice = pd.MultiIndex.from_product([etiquetas[i] for i in quedan], names=por)
+        return pd.Series(arr.ravel(), index=indice, name=medida)
+
+
+def mascara_sitios(df: pd.DataFrame, filtros: dict = None) -> np.ndarray:
+    """
+    Filas de `df` (sitios) que pasan los filtros de municipio y categoría.
+    Se calcula con las columnas del propio DataFrame, no por posición: no
+    depende del orden en que llegaron las filas.
+    """
+    mascara = np.ones(len(df), dtype=bool)
+    for eje in ("municipio", "categoria"):
+        seleccion = (filtros or {}).get(eje)
+        if seleccion and eje in df:
+            mascara &= df[eje].isin(seleccion).to_numpy(dtype=bool)
+    return mascara
+
+
+def sin(filtros: dict, eje: str) -> dict:
+    """Los filtros sin el del eje indicado (un gráfico no se filtra a sí mismo)."""
+    return {e: v for e, v in filtros.items() if e != eje}
+
+
+def construir_cubo(sitios: pd.DataFrame, reseñantes: pd.DataFrame,
+                   tips: pd.DataFrame, google: pd.DataFrame) -> Cubo:
+    def columna(df, nombre):
+        return df[nombre] if nombre in df else None
+
+    etiquetas = {
+        "municipio": _etiquetas(*(columna(df, "municipio") for df in (sitios, reseñantes, tips, google))),
+        "categoria": _etiquetas(columna(sitios, "categoria"), columna(google, "categoria")),
+        "mes": MESES,
+    }
+    # +1: la posición de desconocidos de cada eje
+    n_mun, n_cat, n_mes = (len(etiquetas[e]) + 1 for e in EJES)
+
+    def codigos(df, eje):
+        if eje not in df:
+            return np.full(len(df), -1, dtype=np.int32)
+        if eje == "mes":
+            mes = df["mes"].to_numpy(dtype="float64", na_value=np.nan)
+            return np.where(np.isnan(mes), 0, mes).astype(np.int32) - 1
+        return _codigos(df[eje], etiquetas[eje])
+
+    medidas = {}
+    medidas["sitios"] = (("municipio", "categoria"),
+                         _contar([codigos(sitios, "municipio"), codigos(sitios, "categoria")],
+                                 (n_mun, n_cat)).astype(np.int32))
+    medidas["reseñantes"] = (("municipio",),
+                             _contar([codigos(reseñantes, "municipio")], (n_mun,)).astype(np.int32))
+    medidas["tips"] = (("municipio", "mes"),
+                       _contar([codigos(tips, "municipio"), codigos(tips, "mes")],
+                               (n_mun, n_mes)).astype(np.int32))
+
+    google_cod = [codigos(google, "municipio"), codigos(google, "categoria")]
+    if "puntuacion" in google:
+        puntuacion = pd.to_numeric(google["puntuacion"], errors="coerce").to_numpy(dtype="float64")
+    else:
+        puntuacion = np.full(len(google), np.nan)
+    # Los sitios sin puntuación no cuentan en el promedio
+    con_puntuacion = np.where(np.isnan(puntuacion), np.nan, 1.0)
+    medidas["google_n"] = (("municipio", "categoria"),
+                           _contar(google_cod, (n_mun, n_cat), con_puntuacion).astype(np.int32))
+    medidas["google_suma"] = (("municipio", "categoria"),
+                              _contar(google_cod, (n_mun, n_cat), puntuacion))
+
+    return Cubo(etiquetas, medidas)
+
+
+def huella(df: pd.DataFrame) -> str:
+    """Huella del contenido de un DataFrame (cambia si cambia cualquier fila)."""
+    try:
+        filas = pd.util.hash_pandas_object(df, index=False).values
+    except TypeError:
+        # Celdas no hasheables (listas, dicts): se comparan como texto
+        filas = pd.util.hash_pandas_object(df.astype(str), index=False).values
+    resumen = hashlib.sha1(filas.tobytes())
+    resumen.update("|".join(map(str, df.columns)).encode())
+    return resumen.hexdigest()[:16]
+
+
+def version_frames(frames: dict) -> str:
+    """
+    Versión de los datos de un departamento para la clave del caché del cubo.
+    Usa la huella que el cargador dejó en `df.attrs["version"]` al descargar
+    (calcularla en cada rerun costaría más que construir el cubo); solo los
+    DataFrames sin ella se hashean aquí.
+    """
+    resumen = hashlib.sha1(os.getenv("DASHBOARD_DATOS_VERSION", "1").encode())
+    for nombre in sorted(frames):
+        df = frames[nombre]
+        resumen.update(f"{nombre}:{df.attrs.get('version') or huella(df)}|".encode())
+    return resumen.hexdigest()[:16]
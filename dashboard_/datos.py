@@ -0,0 +1,210 @@
+import os
+import requests
+import numpy as np
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+BASE_URL = os.getenv("DASHBOARD_API_URL", "http://127.0.0.1:8000")
+
+# ======================================================
+# DATASETS DEL DASHBOARD
+# ======================================================
+DEPARTAMENTOS_CARIBE = [
+    "Atlántico", "Bolívar", "Córdoba", "Sucre",
+    "Magdalena", "La Guajira", "Cesar", "San Andrés "
+]
+
+# nombre -> (ruta del endpoint, clave de la lista en el JSON, timeout (conexión, lectura))
+DATASETS = {
+    "sitios": ("/foursquare/sities_clean", "sitios", (3, 15)),
+    "reseñantes": ("/foursquare/reseñantes", "reseñantes", (3, 15)),
+    "tips": ("/foursquare/tips_expand", "tips", (3, 30)),
+    "google": ("/google/sities", "sitios", (3, 15)),
+}
+
+
+# ======================================================
+# CLIENTE HTTP COMPARTIDO (KEEP-ALIVE)
+# ======================================================
+def crear_sesion() -> requests.Session:
+    """Sesión con un pool de conexiones reutilizables hacia la API."""
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=len(DATASETS) * 2)
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+def descargar_json(sesion: requests.Session, nombre: str, departamento: str) -> list:
+    """Descarga un dataset y devuelve la lista de registros. Lanza la excepción si falla."""
+    ruta, clave, timeout = DATASETS[nombre]
+    resp = sesion.get(
+        f"{BASE_URL}{ruta}",
+        params={"departamento": departamento},
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    return resp.json().get(clave, [])
+
+
+def descargar(sesion: requests.Session, nombre: str, departamento: str) -> pd.DataFrame:
+    """Descarga un dataset como DataFrame."""
+    return pd.DataFrame(descargar_json(sesion, nombre, departamento))
+
+
+def descargar_tips(sesion: requests.Session, departamento: str) -> pd.DataFrame:
+    """Tips en forma normalizada (usuarios una vez + tips), ya en columnas planas."""
+    ruta, _, timeout = DATASETS["tips"]
+    resp = sesion.get(
+        f"{BASE_URL}{ruta}",
+        params={"departamento": departamento, "forma": "normalizada"},
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    return tips_desde_normalizado(resp.json())
+
+
+# ======================================================
+# TIPS EN COLUMNAS PLANAS
+# ======================================================
+MESES_MAP = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
+    "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12
+}
+
+# Columnas con pocos valores distintos que se repiten en cada tip
+COLUMNAS_CATEGORIA = [
+    "municipio", "departamento", "user_id", "user_name",
+    "user_location", "user_url", "date",
+]
+
+
+def aplanar_tips(registros: list) -> pd.DataFrame:
+    """
+    Convierte la respuesta de tips_expand (un dict `tip` por fila) en columnas
+    tipadas: `comment`, `date` y `mes` (Int8) junto a los campos del usuario.
+    Las columnas se arman una por una desde los dicts, sin pasar por el
+    DataFrame de objetos completo de json_normalize: cada columna repetida
+    se codifica como categoría apenas se lee.
+    """
+    if not registros:
+        return pd.DataFrame()
+
+    tips = [r.get("tip") if isinstance(r.get("tip"), dict) else {} for r in registros]
+    columnas = [(c, registros) for c in dict.fromkeys(k for r in registros for k in r) if c != "tip"]
+    columnas += [(c, tips) for c in dict.fromkeys(k for t in tips for k in t)]
+
+    df = pd.DataFrame(index=pd.RangeIndex(len(registros)))
+    for col, filas in columnas:
+        nombre = col if filas is registros or col in ("comment", "date") else f"tip_{col}"
+        valores = [f.get(col) for f in filas]
+        df[nombre] = pd.Categorical(valores) if nombre in COLUMNAS_CATEGORIA else valores
+
+    if "comment" not in df:
+        df["comment"] = ""
+    if "date" not in df:
+        df["date"] = pd.Categorical([""] * len(df))
+    df["comment"] = df["comment"].fillna("").astype(str)
+
+    return _agregar_mes(df)
+
+
+def tips_desde_normalizado(cuerpo: dict) -> pd.DataFrame:
+    """
+    Arma el mismo DataFrame que `aplanar_tips` a partir de la respuesta
+    `forma=normalizada`: las columnas del usuario se expanden por tip con
+    sus códigos, sin crear un objeto Python por celda.
+    """
+    usuarios, tips = cuerpo.get("usuarios", {}), cuerpo.get("tips", {})
+    diccionarios = cuerpo.get("diccionarios", {})
+    if not tips.get("usuario"):
+        return pd.DataFrame()
+
+    def categorica(valores, columna):
+        if columna in diccionarios:
+            return pd.Categorical.from_codes(
+                np.asarray(valores, dtype=np.int32),
+                categories=pd.Index(diccionarios[columna], dtype=object),
+            )
+        return pd.Categorical(valores)
+
+    fila_usuario = np.asarray(tips["usuario"], dtype=np.int64)
+    df = pd.DataFrame(index=pd.RangeIndex(len(fila_usuario)))
+
+    for col, valores in usuarios.items():
+        if col in COLUMNAS_CATEGORIA:
+            por_usuario = categorica(valores, col)
+            df[col] = pd.Categorical.from_codes(
+                por_usuario.codes[fila_usuario], categories=por_usuario.categories
+            )
+        else:
+            # Misma inferencia de tipo que en aplanar_tips (tips_count -> int64)
+            df[col] = pd.Series(valores).to_numpy()[fila_usuario]
+
+    for col, valores in tips.items():
+        if col == "usuario":
+            continue
+        nombre = col if col in ("comment", "date") else f"tip_{col}"
+        if nombre in COLUMNAS_CATEGORIA:
+            df[nombre] = categorica(valores, col)
+        else:
+            df[nombre] = valores
+
+    if "comment" not in df:
+        df["comment"] = ""
+    if "date" not in df:
+        df["date"] = pd.Categorical([None] * len(df))
+    df["comment"] = df["comment"].fillna("").astype(str)
+
+    return _agregar_mes(df)
+
+
+def _agregar_mes(df: pd.DataFrame) -> pd.DataFrame:
+    # El mes se calcula una vez por fecha distinta y se reparte con los códigos
+    fechas = df["date"].cat
+    mes_por_fecha = (
+        pd.Series(fechas.categories, dtype=str)
+        .str.split(n=1).str[0].str.lower()
+        .map(MESES_MAP)
+        .to_numpy(dtype="float64")
+    )
+    # el código -1 (fecha nula) apunta al NaN añadido al final
+    mes = np.append(mes_por_fecha, np.nan)[fechas.codes]
+    df["mes"] = pd.array(mes, dtype="Int8")
+
+    return df
+
+
+# ======================================================
+# CARGA CONCURRENTE DE UN DEPARTAMENTO
+# ======================================================
+def cargar_concurrente(cargadores: dict, departamento: str, initializer=None):
+    """
+    Ejecuta en paralelo los cargadores {nombre: funcion(departamento)}.
+    Devuelve (frames, errores): un DataFrame por nombre (vacío si falló)
+    y un dict nombre -> mensaje de error con los que fallaron.
+    """
+    frames, errores = {}, {}
+
+    with ThreadPoolExecutor(max_workers=len(cargadores), initializer=initializer) as pool:
+        futuros = {
+            pool.submit(funcion, departamento): nombre
+            for nombre, funcion in cargadores.items()
+        }
+        for futuro in as_completed(futuros):
+            nombre = futuros[futuro]
+            try:
+                frames[nombre] = futuro.result()
+            except requests.HTTPError as e:
+                frames[nombre] = pd.DataFrame()
+                # 404 = el departamento no tiene datos en esa colección
+                if e.response is None or e.response.status_code != 404:
+                    errores[nombre] = str(e)
+            except Exception as e:
+                frames[nombre] = pd.DataFrame()
+                errores[nombre] = str(e)
+
+    return frames, errores
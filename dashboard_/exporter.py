@@ -1,51 +1,450 @@
+import os
+import csv
+import gzip
+import json
+import time
+import asyncio
+import logging
+import zipfile
+import tempfile
+
 import httpx
-import pandas as pd
-from io import BytesIO
+import xlsxwriter
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import ijson  # lectura incremental del JSON
+except ImportError:
+    ijson = None
+
+log = logging.getLogger(__name__)
+
+API_URL = os.getenv("DASHBOARD_API_URL", "http://localhost:8000")  # Cambiar si tu API está en otro servidor
+
+# hoja -> (endpoint completo, clave de la lista en el JSON)
+ENDPOINTS_COMPLETOS = {
+    "Foursquare_Sitios": ("/foursquare/sities_full", "sitios"),
+    "GoogleMaps_Sitios": ("/google/sities_full", "sitios"),
+    "Foursquare_Tips": ("/foursquare/tips_expand", "tips"),
+    "Foursquare_Reseñantes": ("/foursquare/reseñantes_full", "reseñantes"),
+}
 
-API_URL = "http://localhost:8000"  # Cambiar si tu API está en otro servidor
+MAX_FILAS_EXCEL = 1_048_576  # incluye la fila de encabezado
+FILAS_MUESTRA = 1000         # registros que se miran antes de fijar las columnas
+COLUMNA_OTROS = "otros_campos"
+FILAS_GRUPO = 50_000         # filas por row group (Parquet) / lote (Feather)
 
 
 # ======================================================
-# OBTENER DATOS COMPLETOS DESDE TUS ENDPOINTS REALES
+# LECTURA INCREMENTAL DE LOS ENDPOINTS
 # ======================================================
-async def obtener_datos_completos(departamento: str):
+class _LectorAsync:
+    """
+    Adapta el stream de httpx a la interfaz `await read(n)` que espera ijson.
+    Respeta `n`: ijson empieza con `read(0)` para detectar el tipo del stream,
+    y eso no debe consumir ningún bloque.
+    """
 
-    async with httpx.AsyncClient(timeout=40) as client:
+    def __init__(self, respuesta: httpx.Response):
+        self._bloques = respuesta.aiter_bytes()
+        self._pendiente = b""
+
+    async def read(self, n=-1):
+        if n == 0:
+            return b""
+        while not self._pendiente:
+            try:
+                self._pendiente = await self._bloques.__anext__()
+            except StopAsyncIteration:
+                return b""
+        if n is None or n < 0:
+            n = len(self._pendiente)
+        datos, self._pendiente = self._pendiente[:n], self._pendiente[n:]
+        return datos
+
+
+async def transmitir_registros(client: httpx.AsyncClient, ruta: str, clave: str, departamento: str):
+    """
+    Genera los registros de la lista `clave` a medida que llegan, sin cargar
+    el cuerpo completo. Si el endpoint no tiene datos (404) no genera nada.
+    """
+    async with client.stream("GET", f"{API_URL}{ruta}", params={"departamento": departamento}) as resp:
+        if resp.status_code == 404:
+            return
+        resp.raise_for_status()
 
-        # --- ENDPOINTS QUE DEVUELVEN COMPLETO PARA EXCEL ---
-        r_fs_sities = await client.get(f"{API_URL}/foursquare/sities_full?departamento={departamento}")
-        r_gm_sities = await client.get(f"{API_URL}/google/sities_full?departamento={departamento}")
-        r_fs_tips = await client.get(f"{API_URL}/foursquare/tips_expand?departamento={departamento}")
-        r_fs_reviewers = await client.get(f"{API_URL}/foursquare/reseñantes_full?departamento={departamento}")
+        if ijson is None:
+            # Sin ijson: se lee el cuerpo completo (funciona, pero sin streaming)
+            log.warning("ijson no está instalado: %s se carga entero en memoria", ruta)
+            cuerpo = json.loads(await resp.aread())
+            for registro in cuerpo.get(clave, []):
+                yield registro
+            return
 
+        async for registro in ijson.items_async(_LectorAsync(resp), f"{clave}.item", use_float=True):
+            yield registro
+
+
+def aplanar_registro(registro: dict, prefijo: str = "") -> dict:
+    """Aplana un nivel de dicts anidados (`tip` -> `tip.comment`, `tip.date`)."""
+    plano = {}
+    for k, v in registro.items():
+        if isinstance(v, dict) and not prefijo:
+            plano.update(aplanar_registro(v, f"{k}."))
+        else:
+            plano[f"{prefijo}{k}"] = v
+    return plano
+
+
+def valor_celda(v):
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False, default=str)
+    return v
+
+
+# ======================================================
+# MEMORIA DEL PROCESO
+# ======================================================
+def memoria_actual():
+    """RSS del proceso en bytes (Linux). None si no se puede medir."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
 
-        # Convertir datos a DataFrames
-        df_fs_sities = pd.DataFrame(r_fs_sities.json().get("sitios", []))
-        df_gm_sities = pd.DataFrame(r_gm_sities.json().get("sitios", []))
-        df_fs_tips = pd.DataFrame(r_fs_tips.json().get("tips", []))
-        df_fs_reviewers = pd.DataFrame(r_fs_reviewers.json().get("reseñantes", []))
 
-        return {
-            "Foursquare_Sitios": df_fs_sities,
-            "GoogleMaps_Sitios": df_gm_sities,
-            "Foursquare_Tips": df_fs_tips,
-            "Foursquare_Reseñantes": df_fs_reviewers
-        }
+async def _muestrear_memoria(estado: dict, intervalo: float = 0.1):
+    while True:
+        actual = memoria_actual()
+        if actual is not None:
+            estado["pico"] = max(estado.get("pico", 0), actual)
+        await asyncio.sleep(intervalo)
 
 
 # ======================================================
-# CREAR EL ARCHIVO EXCEL CON MÚLTIPLES HOJAS
+# DESTINOS: ESCRITURA POR FILAS
 # ======================================================
-def crear_excel(dataframes: dict) -> BytesIO:
+class DestinoTabla:
+    """
+    Recibe registros a medida que llegan. Las columnas se fijan con los
+    primeros FILAS_MUESTRA registros; los campos que aparezcan después van
+    como JSON a `otros_campos`. Las subclases implementan `_abrir`,
+    `_escribir_fila`, `_vacio` y `_terminar`.
+    """
 
-    buffer = BytesIO()
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.columnas = None
+        self.filas = 0
+        self.archivos = []
+        self._muestra = []
 
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        for sheet_name, df in dataframes.items():
-            if not df.empty:
-                df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+    def _fijar_columnas(self):
+        columnas = {}
+        for registro in self._muestra:
+            columnas.update(dict.fromkeys(registro))
+        self.columnas = list(columnas) + [COLUMNA_OTROS]
+        self._indices = {c: i for i, c in enumerate(self.columnas)}
+
+        muestra, self._muestra = self._muestra, None
+        self._abrir(muestra)
+        for registro in muestra:
+            self._escribir_fila(self._valores(registro))
+            self.filas += 1
+
+    def _valores(self, registro: dict) -> list:
+        """Valores en el orden de `columnas` (anidados como JSON)."""
+        fila = [None] * len(self.columnas)
+        otros = {}
+        for k, v in registro.items():
+            i = self._indices.get(k)
+            if i is None:
+                otros[k] = v
+            else:
+                fila[i] = valor_celda(v)
+        if otros:
+            fila[-1] = valor_celda(otros)
+        return fila
+
+    def escribir(self, registro: dict):
+        registro = aplanar_registro(registro)
+        if self.columnas is None:
+            self._muestra.append(registro)
+            if len(self._muestra) >= FILAS_MUESTRA:
+                self._fijar_columnas()
+        else:
+            self._escribir_fila(self._valores(registro))
+            self.filas += 1
+
+    def cerrar(self):
+        if self.columnas is None:
+            if self._muestra:
+                self._fijar_columnas()
             else:
-                pd.DataFrame({"info": ["Sin datos"]}).to_excel(writer, sheet_name=sheet_name[:31], index=False)
+                self._vacio()
+                return
+        self._terminar()
+
+    def _abrir(self, muestra):
+        pass
+
+    def _vacio(self):
+        pass
+
+    def _terminar(self):
+        pass
+
+
+class HojaExcel(DestinoTabla):
+    """Hoja de Excel en modo constant_memory; si pasa del límite de filas sigue en `Nombre_2`, ..."""
+
+    def __init__(self, libro, nombre: str, formato_encabezado):
+        super().__init__(nombre)
+        self.libro = libro
+        self.formato_encabezado = formato_encabezado
+        self.hojas = []
+        # La primera hoja se crea ya para respetar el orden de ENDPOINTS_COMPLETOS;
+        # el encabezado se escribe cuando se conocen las columnas
+        self._hoja = libro.add_worksheet(nombre[:31])
+        self.hojas.append(nombre[:31])
+        self._fila = 0
+
+    def _abrir(self, muestra):
+        self._hoja.write_row(0, 0, self.columnas, self.formato_encabezado)
+        self._fila = 1
+
+    def _escribir_fila(self, valores: list):
+        if self._fila >= MAX_FILAS_EXCEL:
+            nombre = f"{self.nombre[:27]}_{len(self.hojas) + 1}"
+            self._hoja = self.libro.add_worksheet(nombre)
+            self.hojas.append(nombre)
+            self._abrir(None)
+
+        for i, v in enumerate(valores):
+            if v is not None:
+                self._hoja.write(self._fila, i, v)
+        self._fila += 1
+
+    def _vacio(self):
+        self._hoja.write_column(0, 0, ["info", "Sin datos"])
+
+
+class CsvGz(DestinoTabla):
+    """Un .csv.gz por dataset, escrito fila a fila."""
+
+    def __init__(self, directorio: str, nombre: str):
+        super().__init__(nombre)
+        self.ruta = os.path.join(directorio, f"{nombre}.csv.gz")
+
+    def _abrir(self, muestra):
+        self._archivo = gzip.open(self.ruta, "wt", newline="", encoding="utf-8", compresslevel=6)
+        self._csv = csv.writer(self._archivo)
+        self._csv.writerow(self.columnas)
+        self.archivos.append(self.ruta)
+
+    def _escribir_fila(self, valores: list):
+        self._csv.writerow(valores)
+
+    def _terminar(self):
+        self._archivo.close()
+
+
+class TablaArrow(DestinoTabla):
+    """
+    Un archivo Parquet o Feather (Arrow IPC) por dataset, escrito en grupos
+    de FILAS_GRUPO filas. El esquema se infiere de la muestra y ya no puede
+    cambiar: una columna de enteros queda int64 (conteos e ids exactos) y
+    solo es float64 si la muestra ya mezcla enteros y decimales. Los valores
+    que no se pueden convertir sin perder información (un 4.5 que llega
+    después de 1000 enteros) quedan nulos y se cuentan en `descartados`.
+    """
+
+    def __init__(self, directorio: str, nombre: str, formato: str):
+        super().__init__(nombre)
+        self.formato = formato
+        extension = "parquet" if formato == "parquet" else "feather"
+        self.ruta = os.path.join(directorio, f"{nombre}.{extension}")
+        self.descartados = 0
+        self._grupo = []
+
+    def _abrir(self, muestra):
+        campos = []
+        columnas = zip(*(self._valores(r) for r in muestra))
+        for columna, valores in zip(self.columnas, columnas):
+            valores = list(valores)
+            try:
+                tipo = pa.array(valores).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                tipo = pa.string()
+            if pa.types.is_null(tipo):
+                tipo = pa.string()
+            campos.append(pa.field(columna, tipo))
+        self.esquema = pa.schema(campos)
+
+        if self.formato == "parquet":
+            self._escritor = pq.ParquetWriter(self.ruta, self.esquema, compression="zstd")
+        else:
+            self._escritor = pa.ipc.new_file(
+                self.ruta, self.esquema,
+                options=pa.ipc.IpcWriteOptions(compression="zstd"),
+            )
+        self.archivos.append(self.ruta)
+
+    @staticmethod
+    def _trunca(v, tipo) -> bool:
+        # pa.array trunca en silencio un float a entero: 4.5 no cabe en int64
+        return pa.types.is_integer(tipo) and isinstance(v, float) and not v.is_integer()
+
+    def _columna(self, valores: list, tipo):
+        if not any(self._trunca(v, tipo) for v in valores):
+            try:
+                return pa.array(valores, type=tipo)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                pass
+        if pa.types.is_string(tipo):
+            return pa.array([None if v is None else str(v) for v in valores], type=tipo)
+
+        limpios = []
+        for v in valores:
+            if not self._trunca(v, tipo):
+                try:
+                    pa.array([v], type=tipo)
+                    limpios.append(v)
+                    continue
+                except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                    pass
+            if pa.types.is_floating(tipo):
+                try:
+                    limpios.append(float(v))  # p. ej. "4.5" como texto
+                    continue
+                except (TypeError, ValueError):
+                    pass
+            limpios.append(None)
+            self.descartados += 1
+        return pa.array(limpios, type=tipo)
+
+    def _volcar_grupo(self):
+        if not self._grupo:
+            return
+        columnas = list(zip(*self._grupo))
+        lote = pa.record_batch(
+            [self._columna(list(c), campo.type) for c, campo in zip(columnas, self.esquema)],
+            schema=self.esquema,
+        )
+        self._escritor.write_batch(lote)
+        self._grupo = []
+
+    def _escribir_fila(self, valores: list):
+        self._grupo.append(valores)
+        if len(self._grupo) >= FILAS_GRUPO:
+            self._volcar_grupo()
+
+    def _terminar(self):
+        self._volcar_grupo()
+        self._escritor.close()
+
+
+# ======================================================
+# EXPORTAR EL DEPARTAMENTO COMPLETO
+# ======================================================
+# formato -> (extensión del archivo descargado, tipo MIME)
+FORMATOS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "parquet": ("parquet.zip", "application/zip"),
+    "feather": ("feather.zip", "application/zip"),
+    "csv.gz": ("csv.zip", "application/zip"),
+}
+
+
+async def _volcar_endpoints(departamento: str, destinos: dict) -> dict:
+    """Descarga los 4 endpoints en paralelo y pasa cada registro a su destino."""
+    errores = {}
+
+    async def volcar(client, nombre, ruta_api, clave):
+        try:
+            async for registro in transmitir_registros(client, ruta_api, clave, departamento):
+                destinos[nombre].escribir(registro)
+        except Exception as e:
+            errores[nombre] = str(e)
+
+    async with httpx.AsyncClient(timeout=40) as client:
+        await asyncio.gather(*(
+            volcar(client, nombre, ruta_api, clave)
+            for nombre, (ruta_api, clave) in ENDPOINTS_COMPLETOS.items()
+        ))
+
+    for destino in destinos.values():
+        destino.cerrar()
+    return errores
+
+
+async def exportar(departamento: str, formato: str = "xlsx"):
+    """
+    Exporta los 4 datasets del departamento sin armar DataFrames: cada
+    registro se escribe apenas llega. `xlsx` produce un libro con una hoja
+    por dataset (constant_memory); `parquet`, `feather` y `csv.gz` producen
+    un zip con un archivo por dataset.
+    Devuelve (ruta del archivo temporal, estadísticas). El llamador lo borra.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+    inicio = time.perf_counter()
+    memoria = {"base": memoria_actual()}
+    muestreo = asyncio.create_task(_muestrear_memoria(memoria))
+
+    fd, ruta = tempfile.mkstemp(suffix="." + FORMATOS[formato][0], prefix="export_")
+    os.close(fd)
+
+    try:
+        if formato == "xlsx":
+            libro = xlsxwriter.Workbook(ruta, {
+                "constant_memory": True,
+                "strings_to_numbers": False,
+                "strings_to_formulas": False,
+                "strings_to_urls": False,  # user_url haría pasar el límite de 65.530 links
+            })
+            encabezado = libro.add_format({"bold": True})
+            destinos = {n: HojaExcel(libro, n, encabezado) for n in ENDPOINTS_COMPLETOS}
+            errores = await _volcar_endpoints(departamento, destinos)
+            libro.close()
+        else:
+            with tempfile.TemporaryDirectory(prefix="export_") as directorio:
+                if formato == "csv.gz":
+                    destinos = {n: CsvGz(directorio, n) for n in ENDPOINTS_COMPLETOS}
+                else:
+                    destinos = {n: TablaArrow(directorio, n, formato) for n in ENDPOINTS_COMPLETOS}
+                errores = await _volcar_endpoints(departamento, destinos)
+
+                # Los archivos ya van comprimidos: el zip solo los agrupa
+                with zipfile.ZipFile(ruta, "w", compression=zipfile.ZIP_STORED) as zf:
+                    for destino in destinos.values():
+                        for archivo in destino.archivos:
+                            zf.write(archivo, os.path.basename(archivo))
+    except BaseException:
+        os.remove(ruta)
+        raise
+    finally:
+        muestreo.cancel()
 
-    buffer.seek(0)
-    return buffer
+    pico = memoria.get("pico")
+    return ruta, {
+        "formato": formato,
+        "filas": {nombre: d.filas for nombre, d in destinos.items()},
+        "archivos": [
+            n for d in destinos.values()
+            for n in (d.hojas if formato == "xlsx" else map(os.path.basename, d.archivos))
+        ],
+        # False sin ijson: cada endpoint se leyó entero en memoria
+        "streaming": ijson is not None,
+        "descartados": sum(getattr(d, "descartados", 0) for d in destinos.values()),
+        # Sin registros: en xlsx quedan como hoja "Sin datos", en los zip no hay archivo
+        "vacios": [n for n, d in destinos.items() if d.filas == 0 and n not in errores],
+        "errores": errores,
+        "segundos": round(time.perf_counter() - inicio, 2),
+        "memoria_pico_mb": round(pico / 1e6, 1) if pico else None,
+        "memoria_extra_mb": round((pico - memoria["base"]) / 1e6, 1) if pico and memoria["base"] else None,
+        "tamaño_mb": round(os.path.getsize(ruta) / 1e6, 2),
+    }
@@ -0,0 +1,88 @@
+import os
+import re
+import hashlib
+from io import BytesIO
+
+import pandas as pd
+from wordcloud import WordCloud, STOPWORDS
+
+# Tamaño de la imagen en píxeles: la columna de la nube mide ~700 px de ancho,
+# así que no hace falta generar más (antes eran 2500x1800).
+ANCHO_PX = 1000
+ALTO_PX = 720
+
+STOPWORDS_ES = STOPWORDS.union({
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "yo",
+    "que", "de", "del", "al", "y", "o", "a", "en", "es", "con"
+})
+
+# Mismo patrón de palabras que usa WordCloud internamente (2+ caracteres)
+PATRON_PALABRA = r"\w[\w']+"
+
+
+# ======================================================
+# FRECUENCIAS (VECTORIZADO)
+# ======================================================
+def calcular_frecuencias(comentarios: pd.Series, stopwords=STOPWORDS_ES) -> dict:
+    """Cuenta las palabras de todos los comentarios sin unirlos en un solo texto."""
+    palabras = (
+        comentarios.dropna()
+        .astype(str)
+        .str.lower()
+        .str.findall(PATRON_PALABRA)
+        .explode()
+        .dropna()
+    )
+    palabras = palabras[~palabras.isin(stopwords) & ~palabras.str.isdigit()]
+    return palabras.value_counts().to_dict()
+
+
+def version_comentarios(comentarios: pd.Series) -> str:
+    """Huella corta de los comentarios: cambia cuando cambian los tips."""
+    huella = pd.util.hash_pandas_object(comentarios, index=False).values
+    return hashlib.sha1(huella.tobytes()).hexdigest()[:16]
+
+
+# ======================================================
+# RENDER A PNG
+# ======================================================
+def renderizar_png(frecuencias: dict, ancho: int = ANCHO_PX, alto: int = ALTO_PX) -> bytes:
+    wc = WordCloud(
+        width=ancho, height=alto,
+        background_color="white",
+    ).generate_from_frequencies(frecuencias)
+
+    buffer = BytesIO()
+    wc.to_image().save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def nube_png(departamento: str, version: str, obtener_frecuencias,
+             ancho: int = ANCHO_PX, alto: int = ALTO_PX, directorio: str = None):
+    """
+    Devuelve los bytes PNG de la nube de palabras, o None si hay menos de 3 palabras.
+    Si se indica `directorio`, la imagen se guarda ahí y se reutiliza entre procesos.
+    `obtener_frecuencias` solo se llama si la imagen no está en disco.
+    """
+    ruta = None
+    if directorio:
+        slug = re.sub(r"\W+", "_", departamento.strip().lower())
+        ruta = os.path.join(directorio, f"nube_{slug}_{version}_{ancho}x{alto}.png")
+        if os.path.exists(ruta):
+            with open(ruta, "rb") as f:
+                return f.read()
+
+    frecuencias = obtener_frecuencias()
+    if sum(frecuencias.values()) < 3:
+        return None
+
+    png = renderizar_png(frecuencias, ancho, alto)
+
+    if ruta:
+        os.makedirs(directorio, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(png)
+        os.replace(temporal, ruta)
+
+    return png
@@ -0,0 +1,310 @@
+"""
+Modo snapshot: el dashboard funciona sin la API, leyendo un paquete local.
+
+Construir un paquete (con la API encendida, DASHBOARD_API_URL):
+    python snapshot.py --salida /datos/snapshots
+    python snapshot.py --salida /datos/snapshots --departamentos Atlántico Bolívar
+
+Usarlo:
+    DASHBOARD_SNAPSHOT=/datos/snapshots streamlit run app.py
+"""
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import argparse
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import cubo
+import datos
+import nube
+
+# ======================================================
+# PAQUETES DE DATOS LOCALES (ARROW + MEMORY MAPPING)
+# ======================================================
+# Un paquete es un directorio versionado dentro de la salida:
+#
+#   <salida>/actual                       nombre de la versión vigente
+#   <salida>/<versión>/manifiesto.json    departamentos, archivos, filas, esquema
+#   <salida>/<versión>/<depto>/<dataset>.arrow   Arrow IPC sin comprimir
+#   <salida>/<versión>/<depto>/cubo_<medida>.npy agregados de cubo.py
+#   <salida>/<versión>/nubes/*.png        nubes de palabras ya renderizadas
+#
+# Arrow sin comprimir y .npy se abren con memory mapping: cargar un
+# departamento cuesta leer páginas del disco, y varios procesos de Streamlit
+# comparten las mismas páginas del caché del sistema operativo. Los textos se
+# quedan en el mapa como columnas pd.ArrowDtype (sin copiarlos a objetos Python).
+#
+# Una versión nueva se escribe aparte y `actual` se cambia al final, así que
+# los procesos que ya tienen abierta la anterior no se ven afectados. Después
+# se borran las versiones viejas y quedan las CONSERVAR más recientes. Un
+# proceso cuya versión se borró sigue usando lo que ya tenía cargado (los
+# mapas siguen válidos) y pasa a la versión vigente al leer algo nuevo.
+
+log = logging.getLogger(__name__)
+
+FORMATO = 1
+MANIFIESTO = "manifiesto.json"
+ACTUAL = "actual"
+DATASETS = ["sitios", "reseñantes", "tips", "google"]
+CONSERVAR = 2
+VERSION = re.compile(r"\d{8}-\d{6}")
+
+
+def _slug(texto: str) -> str:
+    texto = unicodedata.normalize("NFD", texto.strip().lower())
+    texto = "".join(c for c in texto if unicodedata.category(c) != "Mn")
+    return re.sub(r"[^a-z0-9]+", "_", texto).strip("_")
+
+
+# ======================================================
+# CONSTRUCCIÓN
+# ======================================================
+def _tabla(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columnas de objetos con tipos mezclados (p. ej. números y textos): como texto
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].map(lambda v: None if v is None or v != v else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _escribir_arrow(df: pd.DataFrame, ruta: str) -> pa.Schema:
+    tabla = _tabla(df).combine_chunks()
+    # Sin compresión: es lo que permite leerlo en su lugar con memory mapping
+    with pa.OSFile(ruta, "wb") as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return tabla.schema
+
+
+def _escribir_departamento(directorio: str, dep: str, frames: dict) -> dict:
+    carpeta = _slug(dep)
+    os.makedirs(os.path.join(directorio, carpeta), exist_ok=True)
+    entrada = {"carpeta": carpeta, "datasets": {}, "cubo": {}}
+
+    for nombre in DATASETS:
+        df = frames[nombre]
+        archivo = f"{carpeta}/{nombre}.arrow"
+        esquema = _escribir_arrow(df, os.path.join(directorio, archivo))
+        entrada["datasets"][nombre] = {
+            "archivo": archivo,
+            "filas": len(df),
+            "bytes": os.path.getsize(os.path.join(directorio, archivo)),
+            "columnas": {campo.name: str(campo.type) for campo in esquema},
+        }
+
+    cubo_dep = cubo.construir_cubo(frames["sitios"], frames["reseñantes"],
+                                   frames["tips"], frames["google"])
+    for medida, (ejes, arr) in cubo_dep.medidas.items():
+        archivo = f"{carpeta}/cubo_{medida}.npy"
+        np.save(os.path.join(directorio, archivo), arr)
+        entrada["cubo"][medida] = {"archivo": archivo, "ejes": list(ejes)}
+    entrada["etiquetas"] = {
+        eje: valores.tolist() for eje, valores in cubo_dep.etiquetas.items()
+    }
+
+    # La nube se renderiza aquí: en modo snapshot el dashboard solo la lee
+    comentarios = frames["tips"]["comment"] if "comment" in frames["tips"] else pd.Series(dtype=str)
+    entrada["version_comentarios"] = nube.version_comentarios(comentarios)
+    nube.nube_png(
+        dep, entrada["version_comentarios"],
+        lambda: nube.calcular_frecuencias(comentarios),
+        directorio=os.path.join(directorio, "nubes"),
+    )
+    return entrada
+
+
+def construir(salida: str, departamentos: list = None, sesion=None,
+              conservar: int = CONSERVAR) -> dict:
+    """
+    Descarga los datasets de cada departamento desde la API y escribe una
+    versión nueva del paquete en `salida`. Devuelve el manifiesto.
+    Un departamento con algún dataset fallido no entra en el paquete.
+    """
+    departamentos = departamentos or datos.DEPARTAMENTOS_CARIBE
+    sesion = sesion or datos.crear_sesion()
+    version = time.strftime("%Y%m%d-%H%M%S")
+    temporal = os.path.join(salida, f".{version}.tmp")
+    os.makedirs(temporal)
+
+    manifiesto = {
+        "formato": FORMATO,
+        "version": version,
+        "creado": time.time(),
+        "api": datos.BASE_URL,
+        "departamentos": {},
+        "omitidos": {},
+    }
+    cargadores = {
+        "sitios": lambda dep: datos.descargar(sesion, "sitios", dep),
+        "reseñantes": lambda dep: datos.descargar(sesion, "reseñantes", dep),
+        "tips": lambda dep: datos.descargar_tips(sesion, dep),
+        "google": lambda dep: datos.descargar(sesion, "google", dep),
+    }
+    try:
+        for dep in departamentos:
+            frames, errores = datos.cargar_concurrente(cargadores, dep)
+            if errores:
+                manifiesto["omitidos"][dep] = errores
+                log.warning("%s fuera del paquete: %s", dep, errores)
+                continue
+            manifiesto["departamentos"][dep] = _escribir_departamento(temporal, dep, frames)
+            log.info("%s: %s", dep, {n: len(f) for n, f in frames.items()})
+
+        with open(os.path.join(temporal, MANIFIESTO), "w") as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+        os.rename(temporal, os.path.join(salida, version))
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    # Publicar la versión nueva de forma atómica
+    puntero = os.path.join(salida, f".{ACTUAL}.{os.getpid()}.tmp")
+    with open(puntero, "w") as f:
+        f.write(version)
+    os.replace(puntero, os.path.join(salida, ACTUAL))
+    podar(salida, version, conservar)
+    return manifiesto
+
+
+def podar(salida: str, vigente: str, conservar: int = CONSERVAR) -> list:
+    """Borra las versiones más viejas que las `conservar` más recientes (nunca la vigente)."""
+    versiones = sorted(n for n in os.listdir(salida)
+                       if VERSION.fullmatch(n) and os.path.isdir(os.path.join(salida, n)))
+    viejas = [v for v in versiones[:-conservar] if v != vigente]
+    for v in viejas:
+        shutil.rmtree(os.path.join(salida, v), ignore_errors=True)
+        log.info("Versión %s borrada", v)
+    return viejas
+
+
+# ======================================================
+# LECTURA
+# ======================================================
+def _texto_arrow(tipo: pa.DataType):
+    # Los textos se quedan en el buffer mapeado; el resto usa los tipos de siempre
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return pd.ArrowDtype(tipo)
+    return None
+
+
+class Snapshot:
+    """Un paquete abierto. Los DataFrames y cubos se crean una vez por proceso."""
+
+    def __init__(self, ruta: str):
+        self._lock = threading.Lock()
+        self._salida = None
+        if not os.path.exists(os.path.join(ruta, MANIFIESTO)):
+            # Directorio de salida del constructor: usar la versión vigente
+            self._salida = ruta
+            ruta = self._vigente()
+        self._abrir(ruta)
+
+    def _vigente(self) -> str:
+        with open(os.path.join(self._salida, ACTUAL)) as f:
+            return os.path.join(self._salida, f.read().strip())
+
+    def _abrir(self, ruta: str):
+        with open(os.path.join(ruta, MANIFIESTO)) as f:
+            manifiesto = json.load(f)
+        if manifiesto.get("formato") != FORMATO:
+            raise ValueError(f"Formato de snapshot no soportado: {manifiesto.get('formato')}")
+
+        self.manifiesto = manifiesto
+        self.ruta = ruta
+        self.version = manifiesto["version"]
+        self.directorio_nubes = os.path.join(ruta, "nubes")
+        self._frames = {}
+        self._cubos = {}
+
+    def _leer(self, lector):
+        """
+        Ejecuta `lector()` con el lock tomado. Si la versión abierta ya se
+        borró (podar), pasa a la vigente y lo intenta una vez más.
+        """
+        try:
+            return lector()
+        except FileNotFoundError:
+            if self._salida is None or self._vigente() == self.ruta:
+                raise
+            log.info("Snapshot %s borrado: se abre la versión vigente", self.version)
+            self._abrir(self._vigente())
+            return lector()
+
+    @property
+    def departamentos(self) -> list:
+        return list(self.manifiesto["departamentos"])
+
+    def _entrada(self, departamento: str) -> dict:
+        entrada = self.manifiesto["departamentos"].get(departamento)
+        if entrada is None:
+            raise LookupError(f"{departamento} no está en el snapshot {self.version}")
+        return entrada
+
+    def _leer_frame(self, nombre: str, departamento: str) -> pd.DataFrame:
+        archivo = self._entrada(departamento)["datasets"][nombre]["archivo"]
+        # El mapa queda abierto mientras la tabla tenga referencias a sus buffers
+        mapa = pa.memory_map(os.path.join(self.ruta, archivo))
+        tabla = pa.ipc.open_file(mapa).read_all()
+        # Las columnas numéricas sin nulos y los textos no se copian
+        return tabla.to_pandas(split_blocks=True, types_mapper=_texto_arrow)
+
+    def _leer_cubo(self, departamento: str) -> cubo.Cubo:
+        entrada = self._entrada(departamento)
+        arrays = {
+            medida: (tuple(info["ejes"]),
+                     np.load(os.path.join(self.ruta, info["archivo"]), mmap_mode="r"))
+            for medida, info in entrada["cubo"].items()
+        }
+        etiquetas = {eje: np.array(valores, dtype=object)
+                     for eje, valores in entrada["etiquetas"].items()}
+        etiquetas["mes"] = cubo.MESES
+        return cubo.Cubo(etiquetas, arrays)
+
+    def cargar(self, nombre: str, departamento: str) -> pd.DataFrame:
+        clave = (nombre, departamento)
+        with self._lock:
+            if clave not in self._frames:
+                frame = self._leer(lambda: self._leer_frame(nombre, departamento))
+                self._frames[clave] = frame
+            return self._frames[clave]
+
+    def cubo(self, departamento: str) -> cubo.Cubo:
+        with self._lock:
+            if departamento not in self._cubos:
+                cubo_dep = self._leer(lambda: self._leer_cubo(departamento))
+                self._cubos[departamento] = cubo_dep
+            return self._cubos[departamento]
+
+    def version_comentarios(self, departamento: str) -> str:
+        return self._entrada(departamento)["version_comentarios"]
+
+
+def abrir_snapshot():
+    """El paquete de DASHBOARD_SNAPSHOT, o None si no está configurado (modo API)."""
+    ruta = os.getenv("DASHBOARD_SNAPSHOT")
+    return Snapshot(ruta) if ruta else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye un snapshot local del dashboard")
+    parser.add_argument("--salida", required=True)
+    parser.add_argument("--departamentos", nargs="*")
+    parser.add_argument("--conservar", type=int, default=CONSERVAR,
+                        help="versiones que se mantienen en la salida (incluida la nueva)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(args.salida, exist_ok=True)
+    manifiesto = construir(args.salida, args.departamentos, conservar=max(1, args.conservar))
+    print(f"Snapshot {manifiesto['version']}: {len(manifiesto['departamentos'])} departamentos"
+          + (f", omitidos: {', '.join(manifiesto['omitidos'])}" if manifiesto["omitidos"] else ""))
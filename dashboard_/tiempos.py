@@ -0,0 +1,27 @@
+from time import perf_counter
+
+
+class Cronometro:
+    """
+    Tiempo de cada sección de un rerun. `seccion(nombre)` cierra la anterior
+    y abre la siguiente; una sección que se abre varias veces acumula.
+    Los tiempos quedan en el dict `destino` (st.session_state["_tiempos"]),
+    que es lo que lee benchmarks/bench_dashboard.py.
+    """
+
+    def __init__(self, destino: dict):
+        self.tiempos = {}
+        destino["_tiempos"] = self.tiempos
+        self._actual = None
+        self._inicio = 0.0
+
+    def seccion(self, nombre: str):
+        self.fin()
+        self._actual = nombre
+        self._inicio = perf_counter()
+
+    def fin(self):
+        if self._actual is not None:
+            transcurrido = perf_counter() - self._inicio
+            self.tiempos[self._actual] = self.tiempos.get(self._actual, 0.0) + transcurrido
+            self._actual = None
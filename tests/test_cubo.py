@@ -0,0 +1,61 @@
+import os
+import sys
+import pickle
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard_"))
+
+import cubo  # noqa: E402
+
+
+def _cubo():
+    sitios = pd.DataFrame({
+        "municipio": ["Cartagena", None, "Turbaco"],
+        "categoria": ["Nature", "Heritage", ""],
+    })
+    reseñantes = pd.DataFrame({"municipio": ["Cartagena", None]})
+    tips = pd.DataFrame({
+        "municipio": ["Cartagena", "Cartagena"],
+        "mes": pd.array([3, None], dtype="Int8"),
+    })
+    google = pd.DataFrame({"municipio": [], "categoria": [], "puntuacion": []})
+    return cubo.construir_cubo(sitios, reseñantes, tips, google)
+
+
+def test_totales_incluyen_filas_con_ejes_desconocidos():
+    c = _cubo()
+    assert (c.total("sitios"), c.total("reseñantes"), c.total("tips")) == (3, 2, 2)
+
+
+def test_filtros_y_series_ignoran_solo_el_eje_desconocido():
+    c = _cubo()
+    assert c.total("sitios", {"municipio": ["Cartagena"]}) == 1
+    assert c.total("tips", {"municipio": ["Cartagena"]}) == 2
+    assert c.total("tips", {"mes": [3]}) == 1
+
+    por_categoria = c.serie("sitios", "categoria")
+    assert por_categoria.to_dict() == {"Heritage": 1, "Nature": 1}
+    por_mes = c.serie("tips", "mes")
+    assert len(por_mes) == len(cubo.MESES) and por_mes.sum() == 1
+
+
+def test_mascara_sitios_usa_las_columnas():
+    sitios = pd.DataFrame({"municipio": ["B", "A", "B"], "categoria": ["x", "y", "y"]})
+    mascara = cubo.mascara_sitios(sitios, {"municipio": ["B"], "categoria": ["y"]})
+    assert mascara.tolist() == [False, False, True]
+
+
+def test_version_frames_usa_la_huella_guardada():
+    df = pd.DataFrame({"a": np.arange(5)})
+    df.attrs["version"] = cubo.huella(df)
+    copia = pickle.loads(pickle.dumps(df))  # como lo devuelve st.cache_data
+    assert cubo.version_frames({"sitios": copia}) == cubo.version_frames({"sitios": df})
+
+    cambiado = df.assign(a=df["a"] + 1)
+    assert cubo.huella(cambiado) != df.attrs["version"]
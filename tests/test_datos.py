@@ -0,0 +1,57 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("requests")
+
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard_"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_"))
+
+import datos  # noqa: E402
+import normalizacion  # noqa: E402
+
+
+USUARIOS = [
+    {"user_id": "u1", "user_name": "Ana", "municipio": "Cartagena", "departamento": "Bolívar",
+     "tips_count": 2, "tips": [{"comment": "Muy bueno", "date": "Enero 2020", "likes": 3},
+                                {"comment": "Caro", "date": "Marzo 2021", "likes": 0}]},
+    {"user_id": "u2", "user_name": "Luis", "municipio": "Turbaco", "departamento": "Bolívar",
+     "tips_count": 1, "tips": [{"comment": "Bonito", "date": "Julio 2019", "likes": 1}]},
+]
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def _expandidos():
+    return [
+        {**{c: u.get(c) for c in normalizacion.CAMPOS_USUARIO}, "tip": tip}
+        for u in USUARIOS for tip in u["tips"]
+    ]
+
+
+def test_forma_normalizada_da_el_mismo_dataframe():
+    cuerpo = asyncio.run(normalizacion.tips_normalizados(_Cursor(USUARIOS)))
+    esperado = datos.aplanar_tips(_expandidos())
+    obtenido = datos.tips_desde_normalizado(cuerpo)
+
+    assert obtenido["tips_count"].dtype == "int64"
+    pd.testing.assert_frame_equal(
+        obtenido[esperado.columns], esperado, check_categorical=False
+    )
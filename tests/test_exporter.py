@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("xlsxwriter")
+pytest.importorskip("pyarrow")
+
+import httpx  # noqa: E402
+import pyarrow as pa  # noqa: E402
+import pyarrow.feather as feather  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard_"))
+
+import exporter  # noqa: E402
+
+
+def _cuerpo(n):
+    return json.dumps({
+        "fuente": "Foursquare",
+        "tips": [{"user_id": str(i), "tip": {"comment": f"comentario {i}"}} for i in range(n)],
+    }).encode()
+
+
+def _en_bloques(datos, tamaño):
+    return [datos[i:i + tamaño] for i in range(0, len(datos), tamaño)]
+
+
+class _RespuestaFalsa:
+
+    def __init__(self, bloques):
+        self._bloques = bloques
+
+    async def aiter_bytes(self):
+        for bloque in self._bloques:
+            yield bloque
+
+
+def test_lector_respeta_n_y_no_consume_en_read_cero():
+    datos = _cuerpo(50)
+    lector = exporter._LectorAsync(_RespuestaFalsa(_en_bloques(datos, 97)))
+
+    async def leer_todo():
+        assert await lector.read(0) == b""
+        partes = []
+        while True:
+            parte = await lector.read(40)
+            assert len(parte) <= 40
+            if not parte:
+                return b"".join(partes)
+            partes.append(parte)
+
+    assert asyncio.run(leer_todo()) == datos
+
+
+class _StreamEnBloques(httpx.AsyncByteStream):
+
+    def __init__(self, bloques):
+        self._bloques = bloques
+
+    async def __aiter__(self):
+        for bloque in self._bloques:
+            yield bloque
+
+
+def test_transmitir_registros_con_cuerpo_en_varios_bloques():
+    datos = _cuerpo(300)
+
+    def manejador(request):
+        return httpx.Response(200, stream=_StreamEnBloques(_en_bloques(datos, 64)))
+
+    async def contar():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(manejador)) as client:
+            return sum([1 async for _ in exporter.transmitir_registros(
+                client, "/foursquare/tips_expand", "tips", "Atlántico"
+            )])
+
+    assert asyncio.run(contar()) == 300
+
+
+def _escribir_puntuaciones(tmp_path, muestra, despues):
+    destino = exporter.TablaArrow(str(tmp_path), "sitios", "feather")
+    for v in muestra + despues:
+        destino.escribir({"puntuacion": v})
+    destino.cerrar()
+    return destino, feather.read_table(destino.ruta).column("puntuacion")
+
+
+def test_tabla_arrow_conserva_int64_y_descarta_lo_que_no_encaja(tmp_path):
+    muestra = list(range(exporter.FILAS_MUESTRA))
+    destino, columna = _escribir_puntuaciones(
+        tmp_path, muestra, [2**53 + 1, 4.0, 4.5, "sin dato"]
+    )
+
+    assert columna.type == pa.int64()
+    valores = columna.to_pylist()
+    assert valores[len(muestra):] == [2**53 + 1, 4, None, None]
+    assert destino.descartados == 2
+
+
+def test_tabla_arrow_usa_float64_si_la_muestra_mezcla(tmp_path):
+    muestra = [1, 2.5] + list(range(exporter.FILAS_MUESTRA - 2))
+    destino, columna = _escribir_puntuaciones(tmp_path, muestra, [4.5])
+
+    assert columna.type == pa.float64()
+    assert columna.to_pylist()[-1] == 4.5
+    assert destino.descartados == 0
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("wordcloud")
+pytest.importorskip("requests")
+
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard_"))
+
+import datos  # noqa: E402
+import snapshot  # noqa: E402
+
+
+def _frames(dep):
+    return {
+        "sitios": pd.DataFrame({"municipio": ["Cartagena", "Turbaco"], "categoria": ["Nature", "Heritage"]}),
+        "reseñantes": pd.DataFrame({"municipio": ["Cartagena"]}),
+        "tips": pd.DataFrame({"municipio": ["Cartagena"], "comment": ["playa bonita"],
+                              "mes": pd.array([3], dtype="Int8")}),
+        "google": pd.DataFrame({"municipio": ["Cartagena"], "categoria": ["Nature"], "puntuacion": [4.5]}),
+    }, {}
+
+
+def _construir(salida, monkeypatch, version):
+    monkeypatch.setattr(datos, "cargar_concurrente", lambda cargadores, dep: _frames(dep))
+    monkeypatch.setattr(snapshot.time, "strftime", lambda formato: version)
+    return snapshot.construir(str(salida), ["Atlántico", "Bolívar"], sesion=object())
+
+
+def test_poda_y_proceso_abierto_pasa_a_la_version_vigente(tmp_path, monkeypatch):
+    _construir(tmp_path, monkeypatch, "20260101-000000")
+    abierto = snapshot.Snapshot(str(tmp_path))
+    assert abierto.cargar("sitios", "Atlántico")["municipio"].tolist() == ["Cartagena", "Turbaco"]
+
+    _construir(tmp_path, monkeypatch, "20260102-000000")
+    _construir(tmp_path, monkeypatch, "20260103-000000")
+    assert not (tmp_path / "20260101-000000").exists()
+    assert (tmp_path / "20260102-000000").exists()
+
+    # La versión abierta ya no existe: lo nuevo se lee de la vigente
+    assert abierto.cubo("Bolívar").total("sitios") == 2
+    assert abierto.version == "20260103-000000"